@@ -1,32 +1,188 @@
+import os
+
 import featuretools as ft
+import pandas as pd
+
+from . import dfd, fdep, normalize, tane
+from .cache import DependencyCache
+from .classes import Dependencies, PartitionCache
+from .incremental import DependencyState
+
+# number of rows read at a time when finding dependencies in a csv file
+CHUNK_ROWS = 1000000
 
-from . import dfd, normalize
-from .classes import Dependencies
+# largest number of candidate keys to choose the primary key from; keys of one
+# or two attributes come first, but a shorter key beyond them can be missed
+MAX_CANDIDATE_KEYS = 1000
 
 
-def find_dependencies(df, accuracy=0.98, index=None):
+def find_dependencies(df, accuracy=0.98, index=None, n_jobs=1, max_lhs_size=None, return_state=False,
+                      checkpoint=None, resume_from=None, collect_stats=False, cache=None, algorithm='dfd',
+                      time_budget=None, max_cache_bytes=None):
     """
-    Finds dependencies within dataframe df with the DFD search algorithm.
-    Returns the dependencies as a Dependencies object.
+    Finds dependencies within dataframe df with the DFD search algorithm, the
+    TANE algorithm or the FDep algorithm. Returns the dependencies as a Dependencies object.
+
+    The data can also be given as the path of a csv file or as an iterable of
+    dataframe chunks. The chunks are then encoded one at a time into memory
+    mapped temporary files, so the whole table is never held in memory.
 
     Arguments:
-        df (pd.Dataframe) : the dataframe containing data
+        df (pd.Dataframe, str or iterable[pd.DataFrame]) : the dataframe
+        containing data, the path of a csv file, or chunks of the data
 
         accuracy (0 < float <= 1.00; default = 0.98) : the accuracy threshold required in order to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows must hold true the dependency LHS --> RHS)
 
         index (str, optional) : name of column that is intended index of df
 
+        n_jobs (int, optional) : number of processes to search for dependencies
+        with, -1 uses all cores (default 1)
+
+        max_lhs_size (int, optional) : largest number of attributes on the
+        left hand side of a dependency to search for, unbounded if None
+
+        return_state (bool, optional) : if True, also returns the state of the
+        search so the dependencies can be updated with update_dependencies
+        when rows are appended to df. The search then runs in a single process.
+
+        checkpoint (str, optional) : path to periodically save the progress of
+        the search to, so it can be resumed if interrupted
+
+        resume_from (str, optional) : path of a checkpoint saved by an earlier
+        search over the same data with the same parameters, the columns it
+        finished are not searched again
+
+        collect_stats (bool, optional) : if True, also returns what the search
+        did for each column, to see where the time of a search goes
+
+        cache (DependencyCache or str, optional) : cache, or directory of a
+        cache, to look the dependencies up in before searching and to store
+        them in after. Partition sizes stored for columns shared with
+        earlier searches are reused. Requires df to be a DataFrame.
+
+        algorithm (str, optional) : the search algorithm, "dfd" (default)
+        searches each column's LHSs separately, "tane" searches the LHSs of
+        all columns in a single level-wise pass and is often faster when
+        most dependencies have short LHSs, "fdep" derives the LHSs from the
+        agree sets of pairs of rows and is often faster on wide tables with
+        few rows, mostly when accuracy is 1. n_jobs, return_state, checkpoint,
+        resume_from, collect_stats and time_budget are only supported by
+        "dfd".
+
+        time_budget (float, optional) : number of seconds after which the
+        search stops and returns the dependencies confirmed so far, which
+        are found in order of LHS size for every column first. Searches
+        stopped by the budget are not stored in a cache.
+
     Returns:
 
         dependencies (Dependencies) : the dependencies found in the data
         within the contraints provided
+
+        state (DependencyState) : the state of the search, only returned if
+        return_state is True
+
+        stats (dict[str --> SearchStats]) : what the search did for each
+        column that was searched, only returned if collect_stats is True
+
+        complete (dict[str --> bool]) : whether all the LHSs of each column
+        were found, only returned if time_budget is given
     """
-    deps = Dependencies(dfd.dfd(df, accuracy, index))
+    if algorithm not in ('dfd', 'tane', 'fdep'):
+        raise ValueError('Unknown algorithm {}, must be "dfd", "tane" or "fdep"'.format(algorithm))
+    dfd_only = n_jobs != 1 or return_state or collect_stats or time_budget is not None or \
+        checkpoint is not None or resume_from is not None
+    if algorithm != 'dfd' and dfd_only:
+        raise ValueError('n_jobs, return_state, checkpoint, resume_from, collect_stats and time_budget '
+                         'require algorithm="dfd"')
+    if return_state and (checkpoint is not None or resume_from is not None or collect_stats or
+                         cache is not None or time_budget is not None or max_cache_bytes is not None):
+        raise ValueError('return_state cannot be used with checkpoint, resume_from, collect_stats, cache, '
+                         'time_budget or max_cache_bytes')
+    data = df
+    if not isinstance(df, pd.DataFrame):
+        if return_state or cache is not None:
+            raise ValueError('return_state and cache require the data as a DataFrame')
+        if isinstance(df, (str, os.PathLike)):
+            df = pd.read_csv(df, chunksize=CHUNK_ROWS)
+        data = df = PartitionCache.from_chunks(df)
+    if cache is not None:
+        if not isinstance(cache, DependencyCache):
+            cache = DependencyCache(cache)
+        column_hashes = DependencyCache.column_hashes(df)
+        key = DependencyCache.key(column_hashes, accuracy, index, max_lhs_size)
+        deps = cache.get(key)
+        if deps is not None:
+            return _with_extras(deps, {} if collect_stats else None,
+                                dict.fromkeys(df.columns, True) if time_budget is not None else None)
+        data = PartitionCache.from_df(df)
+        data.add_sizes(cache.sizes(column_hashes))
+    if max_cache_bytes is not None:
+        if not isinstance(data, PartitionCache):
+            data = PartitionCache.from_df(df)
+        data.set_max_bytes(max_cache_bytes)
+    if return_state:
+        state = DependencyState.from_df(df, accuracy, index, max_lhs_size)
+        deps = Dependencies(state.dfd_dependencies())
+    elif algorithm == 'tane':
+        deps = Dependencies(tane.tane(data, accuracy, index, max_lhs_size))
+    elif algorithm == 'fdep':
+        deps = Dependencies(fdep.fdep(data, accuracy, index, max_lhs_size))
+    else:
+        stats = {} if collect_stats else None
+        complete = {} if time_budget is not None else None
+        deps = Dependencies(dfd.dfd(data, accuracy, index, n_jobs, max_lhs_size, checkpoint, resume_from, stats,
+                                    time_budget, complete))
     if index is None:
-        prim_key = normalize.choose_index(deps.find_candidate_keys(), df)
+        prim_key = normalize.choose_index(deps.iter_candidate_keys(MAX_CANDIDATE_KEYS), df)
         deps.set_prim_key(prim_key)
     else:
         deps.set_prim_key([index])
+    if cache is not None and (time_budget is None or all(complete.values())):
+        cache.put(key, deps, column_hashes, data.sizes())
+    if return_state:
+        return deps, state
+    return _with_extras(deps, stats if collect_stats else None, complete if time_budget is not None else None)
+
+
+def _with_extras(deps, stats, complete):
+    """
+    Returns deps alone, or with the stats and completeness flags that are
+    not None.
+    """
+    extras = tuple(extra for extra in (stats, complete) if extra is not None)
+    return (deps,) + extras if extras else deps
+
+
+def update_dependencies(dependencies, state, df):
+    """
+    Updates dependencies found by find_dependencies for rows appended to the
+    data. Only the dependencies the new rows can break are re-checked, so the
+    cost mostly depends on the number of new rows rather than on all rows.
+
+    Arguments:
+        dependencies (Dependencies) : the dependencies of the data before
+        the rows were appended
+
+        state (DependencyState) : the state returned along with dependencies
+        by find_dependencies or a previous update_dependencies, it is updated
+        in place
+
+        df (pd.DataFrame) : the appended rows
+
+    Returns:
+        dependencies (Dependencies) : the dependencies of all the rows
+    """
+    state.append(df)
+    deps = Dependencies(state.dfd_dependencies())
+    if state.index is not None:
+        deps.set_prim_key([state.index])
+        return deps
+    keys = deps.find_candidate_keys(MAX_CANDIDATE_KEYS)
+    prim_key = dependencies.get_prim_key()
+    if prim_key is None or not any(set(key) == set(prim_key) for key in keys):
+        prim_key = normalize.choose_index(keys, df)
+    deps.set_prim_key(prim_key)
     return deps
 
 
@@ -112,7 +268,7 @@ def make_entityset(df, dependencies, name=None, time_index=None):
     return ft.EntitySet(name, dataframes, relationships)
 
 
-def auto_entityset(df, accuracy=0.98, index=None, name=None, time_index=None):
+def auto_entityset(df, accuracy=0.98, index=None, name=None, time_index=None, n_jobs=1):
     """
     Creates a normalized entityset from a dataframe.
 
@@ -128,24 +284,29 @@ def auto_entityset(df, accuracy=0.98, index=None, name=None, time_index=None):
 
         time_index (str, optional) : name of time column in the dataframe.
 
+        n_jobs (int, optional) : number of processes to search for dependencies
+        with, -1 uses all cores (default 1)
+
     Returns:
 
         entityset (ft.EntitySet) : created entity set
     """
-    return make_entityset(df, find_dependencies(df, accuracy, index), name, time_index)
+    return make_entityset(df, find_dependencies(df, accuracy, index, n_jobs), name, time_index)
 
 
-def auto_normalize(df):
+def auto_normalize(df, n_jobs=1):
     """
     Normalizes dataframe via dependencies discovered in data.
 
     Arguments:
         df (pd.DataFrame) : dataframe to split up
+        n_jobs (int, optional) : number of processes to search for dependencies
+        with, -1 uses all cores (default 1)
 
     Returns:
         new_dfs (list[pd.DataFrame]) : list of new dataframes
     """
-    return normalize_dataframe(df, find_dependencies(df))
+    return normalize_dataframe(df, find_dependencies(df, n_jobs=n_jobs))
 
 
 def normalize_entityset(es, accuracy=0.98):
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from .classes import Dependencies
+
+# default largest total size of the files in a DependencyCache
+CACHE_MAX_BYTES = 2 ** 30
+
+
+class DependencyCache(object):
+    """
+    An on-disk cache of discovered dependencies, keyed by a fingerprint of
+    the data and the search parameters. Each entry is a file holding the
+    dependencies and, optionally, a second file holding the numbers of
+    equivalence classes of the column combinations computed by the search.
+    The sizes are stored by the hashes of the columns, so a search over
+    other data that shares some of the same columns can reuse them. When
+    the files take more than max_bytes, the least recently used entries are
+    removed.
+
+    Several processes can share a directory: files are written under unique
+    temporary names and then renamed into place, and files removed by
+    another process while being read or evicted are treated as misses.
+
+    Attributes:
+        directory (str) : directory the entries are stored in
+
+        max_bytes (int) : largest total size of the entries
+
+        store_sizes (bool) : whether to store partition sizes with the
+        dependencies
+
+        _sizes (dict[str --> tuple]) : the sizes files read so far, by name,
+        with the modification time they were read at
+    """
+
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES, store_sizes=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store_sizes = store_sizes
+        self._sizes = {}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def column_hashes(df):
+        """
+        Returns a hash of the name, dtype and values of each column of df.
+
+        Arguments:
+            df (pd.DataFrame) : the data
+
+        Returns:
+            hashes (list[str]) : hash of each column
+        """
+        hashes = []
+        for col in df.columns:
+            digest = hashlib.sha256(repr((col, str(df[col].dtype), df.shape[0])).encode())
+            digest.update(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes())
+            hashes.append(digest.hexdigest())
+        return hashes
+
+    @staticmethod
+    def key(column_hashes, accuracy, index, max_lhs_size):
+        """
+        Returns the key of the entry for data with column_hashes searched
+        with the given parameters.
+        """
+        return hashlib.sha256(repr((column_hashes, accuracy, index, max_lhs_size)).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the dependencies stored under key, or None if there are none.
+
+        Arguments:
+            key (str) : key of the entry
+
+        Returns:
+            dependencies (Dependencies or None) : the cached dependencies
+        """
+        entry = self._load(self._path(key))
+        if entry is None:
+            return None
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        return Dependencies(entry['dependencies'], entry['prim_key'])
+
+    def put(self, key, dependencies, column_hashes, sizes=None):
+        """
+        Stores dependencies under key and removes entries if the cache is
+        larger than max_bytes.
+
+        Arguments:
+            key (str) : key of the entry
+
+            dependencies (Dependencies) : the dependencies to store
+
+            column_hashes (list[str]) : hash of each column of the data
+
+            sizes (dict[int --> int], optional) : number of equivalence
+            classes of each bitmask of columns
+        """
+        if self.store_sizes and sizes:
+            by_cols = {}
+            for mask, size in sizes.items():
+                cols = frozenset(column_hashes[i] for i in range(len(column_hashes)) if mask >> i & 1)
+                by_cols[cols] = size
+            self._write(self._sizes_path(key), by_cols)
+        self._write(self._path(key), {'dependencies': dependencies.serialize(),
+                                      'prim_key': dependencies.get_prim_key()})
+        self._evict()
+
+    def sizes(self, column_hashes):
+        """
+        Returns the stored numbers of equivalence classes of combinations of
+        the given columns, from every entry in the cache.
+
+        Arguments:
+            column_hashes (list[str]) : hash of each column of the data
+
+        Returns:
+            sizes (dict[int --> int]) : number of equivalence classes of
+            each bitmask of columns
+        """
+        positions = {col: i for i, col in enumerate(column_hashes)}
+        sizes = {}
+        for cols, size in self._stored_sizes().items():
+            if all(col in positions for col in cols):
+                sizes[sum(1 << positions[col] for col in cols)] = size
+        return sizes
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        for path in self._paths(('.pkl', '.sizes')):
+            self._remove(path)
+        self._sizes = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _sizes_path(self, key):
+        return os.path.join(self.directory, key + '.sizes')
+
+    def _paths(self, suffixes='.pkl'):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(suffixes)]
+
+    def _write(self, path, obj):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _stat(self, path):
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def _stored_sizes(self):
+        """
+        Returns the sizes from every sizes file, only reading the files that
+        are new or changed since the last call.
+        """
+        seen = {}
+        for path in self._paths('.sizes'):
+            stat = self._stat(path)
+            if stat is None:
+                continue
+            name = os.path.basename(path)
+            known = self._sizes.get(name)
+            if known is None or known[0] != stat.st_mtime_ns:
+                entry = self._load(path)
+                if entry is None:
+                    continue
+                known = (stat.st_mtime_ns, entry)
+            seen[name] = known
+        self._sizes = seen
+        sizes = {}
+        for _, entry in seen.values():
+            sizes.update(entry)
+        return sizes
+
+    def _evict(self):
+        entries = {}
+        for path in self._paths(('.pkl', '.sizes')):
+            stat = self._stat(path)
+            if stat is None:
+                continue
+            stem, ext = os.path.splitext(path)
+            entry = entries.setdefault(stem, [stat.st_mtime, 0, []])
+            if ext == '.pkl':
+                entry[0] = stat.st_mtime
+            entry[1] += stat.st_size
+            entry[2].append(path)
+        total = sum(nbytes for _, nbytes, _ in entries.values())
+        for _, nbytes, paths in sorted(entries.values()):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                self._remove(path)
+            total -= nbytes
@@ -1,14 +1,74 @@
-import copy
-from itertools import combinations
+import heapq
+import tempfile
+from itertools import combinations, count, product
+
+import numpy
+import pandas as pd
+
+
+def bits(mask):
+    """
+    Returns the positions of the set bits of an attribute bitmask, lowest
+    first.
+
+    Args:
+        mask (int) : bitmask where bit i represents the i-th attribute
+
+    Returns:
+        positions (list[int]) : the positions of the attributes in mask
+    """
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+def to_mask(attrs, columns):
+    """
+    Returns the bitmask of a set of attribute names.
+
+    Args:
+        attrs (iterable[str]) : names of the attributes
+        columns (list[str]) : all attributes; the i-th one is bit i
+
+    Returns:
+        mask (int) : bitmask of attrs
+    """
+    positions = {col: i for i, col in enumerate(columns)}
+    mask = 0
+    for attr in attrs:
+        mask |= 1 << positions[attr]
+    return mask
+
+
+def to_attrs(mask, columns):
+    """
+    Returns the attribute names of a bitmask.
+
+    Args:
+        mask (int) : bitmask of attributes
+        columns (list[str]) : all attributes; the i-th one is bit i
+
+    Returns:
+        attrs (frozenset[str]) : the attributes in mask
+    """
+    return frozenset(columns[i] for i in bits(mask))
 
 
 class LHSs(object):
     """
     Efficiently stores the Left-Hand-Sides for dependency relations for a
-    single Right-Hand-Side.
+    single Right-Hand-Side. LHSs are bitmasks of attributes, kept in a
+    set-trie (Savnik, 2013): every LHS is a path from the root through its
+    attributes in increasing order, so subset and superset queries only
+    follow the branches that can still match instead of checking every LHS.
 
     Attributes:
-        _dic
+        _trie (dict[int --> dict]) : children of the root by attribute, a
+        node holding the key None ends a LHS
+        _sets (set[int]) : all the LHSs
         _attrs
     """
 
@@ -17,67 +77,116 @@ class LHSs(object):
         Creates a LHSs.
 
         Args:
-            attrs (list[str]) : list of names of attributes that will be in LHSs
+            attrs (int) : bitmask of attributes that will be in LHSs
         """
-        self._dic = {}
+        self._trie = {}
+        self._sets = set()
         self._attrs = attrs
-        for at in attrs:
-            self._dic[at] = set()
 
     def add_dep(self, attr_set):
         """
         Adds attr_set as a LHS.
 
         Args:
-            attr_set (frozenset[str]) : the set of attributes in the LHS to add
+            attr_set (int) : bitmask of the attributes in the LHS to add
+        """
+        if attr_set == 0 or attr_set in self._sets:
+            return
+        self._sets.add(attr_set)
+        node = self._trie
+        for attr in bits(attr_set):
+            node = node.setdefault(attr, {})
+        node[None] = True
+
+    def remove_dep(self, attr_set):
         """
-        for attr in attr_set:
-            self._dic[attr].add(attr_set)
+        Removes attr_set as a LHS, along with the branches of the trie only
+        it used.
+
+        Args:
+            attr_set (int) : bitmask of the attributes in the LHS to remove
+        """
+        if attr_set not in self._sets:
+            return
+        self._sets.remove(attr_set)
+        path = []
+        node = self._trie
+        for attr in bits(attr_set):
+            path.append((node, attr))
+            node = node[attr]
+        del node[None]
+        for parent, attr in reversed(path):
+            if parent[attr]:
+                break
+            del parent[attr]
+
+    def __contains__(self, attr_set):
+        return attr_set in self._sets
 
     def all_sets(self):
         """
         Returns all LHSs stored in self.
 
         Returns:
-            all_sets (set[frozenset]) : all the LHS sets.
+            all_sets (set[int]) : all the LHS bitmasks.
         """
-        result = set()
-        for attr in self._attrs:
-            for lhs in self._dic[attr]:
-                result.add(lhs)
-        return result
+        return set(self._sets)
 
     def contains_subset(self, attr_set):
         """
         Returns True if self contains a subset of attr_set, False otherwise.
+        Only the branches of the attributes in attr_set are followed.
 
         Args:
-            attr_set (set[str]) : set of attributes to look for subset of
+            attr_set (int) : bitmask of attributes to look for subset of
 
         Returns:
             contains_subset (bool) : whether self contains subset of attr_set
         """
-        for x in attr_set:
-            for lhs in self._dic[x]:
-                if lhs.issubset(attr_set):
+        if attr_set in self._sets:
+            return True
+        if attr_set & self._attrs == 0:
+            return False
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            for attr, child in node.items():
+                if attr is None:
                     return True
+                if attr_set >> attr & 1:
+                    stack.append(child)
         return False
 
     def contains_superset(self, attr_set):
         """
         Returns True if self. contains a superset of attr_set, False otherwise.
+        Only the branches of attributes below the lowest attribute of
+        attr_set not yet on the path are followed.
 
         Args:
-            attr_set (set[str]) : set of attributes to look for superset of
+            attr_set (int) : bitmask of attributes to look for superset of
 
         Returns:
             contains_superset (bool) : whether self contains a superset of
             attr_set
         """
-        for x in attr_set:
-            for lhs in self._dic[x]:
-                if attr_set.issubset(lhs):
-                    return True
+        if attr_set in self._sets:
+            return True
+        if attr_set & self._attrs == 0:
+            return False
+        stack = [(self._trie, attr_set)]
+        while stack:
+            node, rest = stack.pop()
+            if rest == 0:
+                return True
+            low = (rest & -rest).bit_length() - 1
+            for attr, child in node.items():
+                if attr is None or attr > low:
+                    continue
+                if attr == low:
+                    stack.append((child, rest & ~(1 << low)))
+                else:
+                    stack.append((child, rest))
         return False
 
 
@@ -87,6 +196,7 @@ class DfdDependencies(object):
 
     Attributes:
         _dic
+        _attrs
     """
 
     def __init__(self, attrs):
@@ -94,8 +204,10 @@ class DfdDependencies(object):
         Creates an empty DfdDependencies.
 
         Args:
-            attrs (list[str]) : all the attributes in the dataset investigating
+            attrs (list[str]) : all the attributes in the dataset investigating,
+            where the i-th attribute is bit i of the LHSs added
         """
+        self._attrs = list(attrs)
         self._dic = {}
         for rhs in attrs:
             self._dic[rhs] = set()
@@ -113,14 +225,50 @@ class DfdDependencies(object):
 
     def add_LHSs(self, rhs, lhss):
         """
-        Adds all the lhs sets in lhss for rhs.
+        Adds all the lhs sets in lhss for rhs, converting them from bitmasks
+        to attribute names.
 
         Args:
             rhs (str) : attribute to add lhss for
             lhss (LHSs) : lhss to add
         """
         for lhs in lhss.all_sets():
-            self._dic[rhs].add(lhs)
+            self._dic[rhs].add(to_attrs(lhs, self._attrs))
+
+    def add_constant(self, attr):
+        """
+        Adds every other attribute as a lhs of the constant attribute attr.
+
+        Args:
+            attr (str) : the constant attribute
+        """
+        for lhs_attr in self._attrs:
+            if lhs_attr != attr:
+                self._dic[attr].add(frozenset([lhs_attr]))
+
+    def add_equivalents(self, equivalents):
+        """
+        Adds the lhss of attributes equivalent to an attribute whose lhss
+        were added. In every lhs, each such attribute can be replaced by any
+        attribute equivalent to it. The equivalent attributes get the same
+        lhss, and each is a lhs of the others.
+
+        Args:
+            equivalents (dict[str --> list[str]]) : the other attributes
+            equivalent to each attribute whose lhss were added
+        """
+        for rhs in self._dic:
+            expanded = set()
+            for lhs in self._dic[rhs]:
+                options = [[attr] + list(equivalents.get(attr, [])) for attr in lhs]
+                expanded.update(frozenset(combo) for combo in product(*options))
+            self._dic[rhs] = expanded
+        for attr, others in equivalents.items():
+            group = [attr] + list(others)
+            lhss = set(self._dic[attr])
+            for rhs in group:
+                self._dic[rhs] |= lhss
+                self._dic[rhs] |= set(frozenset([lhs_attr]) for lhs_attr in group if lhs_attr != rhs)
 
     def serialize(self):
         ser = self._dic.copy()
@@ -135,7 +283,7 @@ class Node(object):
     dependency search.
 
     Attributes:
-        attrs (frozenset[str]) : attributes in the node
+        attrs (int) : bitmask of the attributes in the node
 
         visited (bool) : True if the node has been visited, False otherwise
 
@@ -148,42 +296,33 @@ class Node(object):
             -2 = Maximal Non-dependency
             -3 = Candidate Maximal Non-dependency
 
-        prev (set[Node]) : child nodes (subsets with one less element)
-
-        next (set[Node]) : parent nodes (supersets with one more element)
+        lattice (Lattice) : the lattice the node belongs to, which creates
+        its subset and superset nodes on demand, and indexes the node by
+        whether it is classified as a dependency or non-dependency
     """
 
-    def __init__(self, attr_set):
+    def __init__(self, attr_set, lattice=None):
         """
         Creates a node.
 
         Args:
-            attr_set (set[str]) : attributes that the node represents
+            attr_set (int) : bitmask of the attributes that the node represents
+            lattice (Lattice, optional) : lattice the node belongs to
         """
         assert attr_set is not None
         self.attrs = attr_set
         self.visited = False
-        self.category = 0
-        self.prev = set()
-        self.next = set()
-
-    def add_prev(self, prev):
-        """
-        Adds node prev to previous nodes.
-
-        Args:
-            prev (Node) : previous node
-        """
-        self.prev.add(prev)
+        self._category = 0
+        self.lattice = lattice if lattice is not None else Lattice(attr_set)
 
-    def add_next(self, next):
-        """
-        Adds node next to next nodes.
+    @property
+    def category(self):
+        return self._category
 
-        Args:
-            next (Node) : next node
-        """
-        self.next.add(next)
+    @category.setter
+    def category(self, category):
+        self.lattice.reclassify(self.attrs, self._category, category)
+        self._category = category
 
     def is_candidate(self):
         """
@@ -206,30 +345,32 @@ class Node(object):
 
     def is_minimal(self):
         """
-        Returns True if self is minimal. Node is minimal if all subsets in
-        self.prev are classified as non-dependencies. If self is minimal,
-        updates the self.category to minimal dependency.
+        Returns True if self is minimal. Node is minimal if all subsets with
+        one less element are classified as non-dependencies. If self is
+        minimal, updates the self.category to minimal dependency.
 
         Returns:
             is_minimal (bool) : if self is minmal
         """
-        for x in self.prev:
-            if x.category >= 0:
+        for attrs in self.lattice.subset_attrs(self.attrs):
+            x = self.lattice.get(attrs)
+            if x is None or x.category >= 0:
                 return False
         self.category = 2
         return True
 
     def is_maximal(self):
         """
-        Returns True if self is maximal. Node is maximal if all supersets in
-        self.next are classified as dependencies. If self is maximal, updates
-        the self.catigory to maximal dependency.
+        Returns True if self is maximal. Node is maximal if all supersets with
+        one more element are classified as dependencies. If self is maximal,
+        updates the self.catigory to maximal dependency.
 
         Returns:
             is_maximal (bool) : if self is maximal
         """
-        for x in self.next:
-            if x.category <= 0:
+        for attrs in self.lattice.superset_attrs(self.attrs):
+            x = self.lattice.get(attrs)
+            if x is None or x.category <= 0:
                 return False
         self.category = -2
         return True
@@ -258,7 +399,7 @@ class Node(object):
         Returns:
             unchecked_subsets (list[Node]) : unchecked subsets
         """
-        return [x for x in self.prev if not x.visited]
+        return [self.lattice.node(x) for x in self.lattice.subset_attrs(self.attrs) if not self.lattice.is_visited(x)]
 
     def unchecked_supersets(self):
         """
@@ -268,54 +409,187 @@ class Node(object):
         Returns:
             unchecked_supersets (list[Node]) : unchecked supersets
         """
-        return [x for x in self.next if not x.visited]
+        return [self.lattice.node(x) for x in self.lattice.superset_attrs(self.attrs) if not self.lattice.is_visited(x)]
 
     def infer_type(self):
         """
         Attempts to infer the category of self by checking if any subsets are a
         dependency, or if any supersets are a non-dependency.
         """
-        # TO DO: optimize, this is inefficient (or it's helper functions are)
         if self._dep_subset():
             self.category = 1
         if self._non_dep_superset():
             self.category = -1
 
     def _dep_subset(self):
-        stack = self.prev.copy()
-        while len(stack) != 0:
-            n = stack.pop()
-            if n.category > 0:
-                return True
-            for x in n.prev:
-                stack.add(x)
-        return False
+        return self.lattice.has_dep_subset(self.attrs)
 
     def _non_dep_superset(self):
-        stack = self.next.copy()
-        while len(stack) != 0:
-            n = stack.pop()
-            if n.category < 0:
-                return True
-            for x in n.next:
-                stack.add(x)
-        return False
+        return self.lattice.has_non_dep_superset(self.attrs)
 
     def __hash__(self):
         return id(self)
 
     def __str__(self):
         return str({"attributes": str(self.attrs), "visited": self.visited,
-                    "category": self.category, "prev": self.prev, "next": self.next, "loc": id(self)})
+                    "category": self.category, "loc": id(self)})
+
+
+class Lattice(object):
+    """
+    The lattice graph of attribute sets searched by DFD. Nodes are only
+    created when the search moves to them; the subsets and supersets of a
+    node are derived from its attributes rather than stored as edges, so
+    memory scales with the number of nodes visited instead of 2^n. The
+    classified nodes are indexed in two set-tries, one of dependencies and
+    one of non-dependencies, so inferring the type of a node doesn't scan
+    the nodes created so far.
+
+    Attributes:
+        attrs (int) : bitmask of all attributes in the lattice
+        max_size (int or None) : largest number of attributes in a node
+        _nodes
+        _deps (LHSs) : attributes of the nodes classified as dependencies
+        _non_deps (LHSs) : attributes of the nodes classified as
+        non-dependencies
+    """
+
+    def __init__(self, attrs, max_size=None):
+        """
+        Creates an empty Lattice.
+
+        Args:
+            attrs (int) : bitmask of the attributes the lattice is over
+            max_size (int, optional) : largest number of attributes in a node,
+            unbounded if None
+        """
+        self.attrs = attrs
+        self.max_size = max_size
+        self._nodes = {}
+        self._deps = LHSs(attrs)
+        self._non_deps = LHSs(attrs)
+
+    def node(self, attr_set):
+        """
+        Returns the node for attr_set, creating it if it doesn't exist yet.
+
+        Args:
+            attr_set (int) : bitmask of the attributes of the node
+
+        Returns:
+            node (Node) : the node for attr_set
+        """
+        if attr_set not in self._nodes:
+            self._nodes[attr_set] = Node(attr_set, self)
+        return self._nodes[attr_set]
+
+    def get(self, attr_set):
+        """
+        Returns the node for attr_set, or None if it hasn't been created.
+        """
+        return self._nodes.get(attr_set)
+
+    def is_visited(self, attr_set):
+        """
+        Returns True if the node for attr_set exists and has been visited.
+        """
+        n = self._nodes.get(attr_set)
+        return n is not None and n.visited
+
+    def nodes(self):
+        """
+        Returns all nodes created so far.
+
+        Returns:
+            nodes (list[Node]) : created nodes
+        """
+        return list(self._nodes.values())
+
+    def reclassify(self, attr_set, old, new):
+        """
+        Moves attr_set between the dependency and non-dependency indexes when
+        the category of its node changes from old to new.
+
+        Args:
+            attr_set (int) : bitmask of the attributes of the node
+            old (int) : previous category of the node
+            new (int) : new category of the node
+        """
+        if (old > 0) == (new > 0) and (old < 0) == (new < 0):
+            return
+        if old > 0:
+            self._deps.remove_dep(attr_set)
+        elif old < 0:
+            self._non_deps.remove_dep(attr_set)
+        if new > 0:
+            self._deps.add_dep(attr_set)
+        elif new < 0:
+            self._non_deps.add_dep(attr_set)
+
+    def has_dep_subset(self, attr_set):
+        """
+        Returns True if a proper subset of attr_set is classified as a
+        dependency, False otherwise.
+        """
+        if attr_set in self._deps:
+            return any(self._deps.contains_subset(x) for x in self.subset_attrs(attr_set))
+        return self._deps.contains_subset(attr_set)
+
+    def has_non_dep_superset(self, attr_set):
+        """
+        Returns True if a proper superset of attr_set is classified as a
+        non-dependency, False otherwise.
+        """
+        if attr_set in self._non_deps:
+            return any(self._non_deps.contains_superset(attr_set | (1 << x))
+                       for x in bits(self.attrs & ~attr_set))
+        return self._non_deps.contains_superset(attr_set)
+
+    def subset_attrs(self, attr_set):
+        """
+        Returns the attribute sets of the subsets of attr_set with one less
+        element, excluding the empty set.
+
+        Returns:
+            subsets (list[int]) : subsets with one less element
+        """
+        if attr_set & (attr_set - 1) == 0:
+            return []
+        return [attr_set & ~(1 << x) for x in bits(attr_set)]
+
+    def superset_attrs(self, attr_set):
+        """
+        Returns the attribute sets of the supersets of attr_set in the
+        lattice with one more element. Nodes at the lattice's maximum size
+        have no supersets.
+
+        Returns:
+            supersets (list[int]) : supersets with one more element
+        """
+        if self.max_size is not None and bin(attr_set).count('1') >= self.max_size:
+            return []
+        return [attr_set | (1 << x) for x in bits(self.attrs & ~attr_set)]
 
 
 class Dependencies(object):
     """
     Represents the functional dependencies between a set of attributes.
 
+    The LHSs of each RHS are kept as a tuple of tuples, which are never
+    modified: adding or removing a dependency replaces the tuple of its RHS.
+    Dependencies split from each other share the tuples of the RHSs they
+    have in common, along with the bitmasks of their LHSs, which are
+    computed when first needed.
+
     Attributes:
-        _data
+        _lhss (dict[str --> tuple[tuple[str]]]) : the LHSs of each RHS
         _primkey
+        _positions (dict[str --> int]) : position of each attribute in the
+        bitmasks, only ever added to, so it is shared by split Dependencies
+        _masks (dict[str --> tuple[int]]) : bitmasks of the LHSs of each RHS,
+        filled when first needed
+        _closure (Closure or None) : closures under the relations in _lhss,
+        built when first needed and reset when they change
     """
 
     def __init__(self, dependencies, prim_key=None):
@@ -331,11 +605,26 @@ class Dependencies(object):
         assert prim_key is None or isinstance(prim_key, list)
         if isinstance(prim_key, list):
             prim_key.sort()
-        if isinstance(dependencies, dict):
-            self._data = dependencies
-        else:
-            self._data = dependencies.serialize()
+        if not isinstance(dependencies, dict):
+            dependencies = dependencies.serialize()
+        self._lhss = {rhs: tuple(tuple(lhs) for lhs in lhss) for rhs, lhss in dependencies.items()}
         self._primkey = prim_key
+        self._positions = {attr: i for i, attr in enumerate(self._lhss)}
+        self._masks = {}
+        self._closure = None
+
+    @classmethod
+    def _from_lhss(cls, lhss, prim_key, parent):
+        """
+        Creates a Dependencies from LHS tuples, sharing the bitmasks parent
+        computed for the tuples it has in common with lhss.
+        """
+        deps = cls({}, prim_key)
+        deps._lhss = lhss
+        deps._positions = parent._positions
+        deps._masks = {rhs: parent._masks[rhs] for rhs in lhss
+                       if rhs in parent._masks and lhss[rhs] is parent._lhss.get(rhs)}
+        return deps
 
     def set_prim_key(self, prim_key):
         """
@@ -366,8 +655,8 @@ class Dependencies(object):
             lhs (list[str]) : the attributes on the left hand side of dependency
             rhs (str) : the attribute on the right hand side
         """
-        assert rhs in self._data
-        self._data[rhs].append(lhs)
+        assert rhs in self._lhss
+        self._set_lhss(rhs, self._lhss[rhs] + (tuple(lhs),))
 
     def remove_dep(self, rhs, lhs):
         """
@@ -377,11 +666,18 @@ class Dependencies(object):
             lhs (list[str]) : the attributes on the left hand side of dependency
             rhs (str) : the attribute on the right hand side
         """
-        assert rhs in self._data
-        self._data[rhs].remove(lhs)
+        assert rhs in self._lhss
+        lhss = list(self._lhss[rhs])
+        lhss.remove(tuple(lhs))
+        self._set_lhss(rhs, tuple(lhss))
+
+    def _set_lhss(self, rhs, lhss):
+        self._lhss[rhs] = lhss
+        self._masks.pop(rhs, None)
+        self._closure = None
 
     def serialize(self):
-        return copy.deepcopy(self._data)
+        return {rhs: [list(lhs) for lhs in lhss] for rhs, lhss in self._lhss.items()}
 
     @classmethod
     def deserialize(cls, dic):
@@ -416,9 +712,9 @@ class Dependencies(object):
         For printing, visually displays dependency relations.
         """
         result = []
-        for rhs in self._data:
+        for rhs in self._lhss:
             lhs_str = ""
-            for lhs in self._data[rhs]:
+            for lhs in self._lhss[rhs]:
                 lhs_str = lhs_str + " {" + ",".join(lhs) + "} "
             lhs_str = lhs_str + " --> " + rhs
             result.append(lhs_str)
@@ -428,7 +724,53 @@ class Dependencies(object):
         """
         For object comparison.
         """
-        return self._data == dep_2._data
+        return self._lhss == dep_2._lhss
+
+    def to_mask(self, attrs):
+        """
+        Returns the bitmask of attrs.
+
+        Arguments:
+            attrs (iterable[str]) : attributes
+
+        Returns:
+            mask (int) : bitmask of the attributes
+        """
+        mask = 0
+        for attr in attrs:
+            if attr not in self._positions:
+                self._positions[attr] = len(self._positions)
+            mask |= 1 << self._positions[attr]
+        return mask
+
+    def lhs_masks(self, rhs):
+        """
+        Returns the bitmasks of the LHSs of rhs, in the order of the LHSs.
+
+        Arguments:
+            rhs (str) : the attribute on the right hand side
+
+        Returns:
+            masks (tuple[int]) : bitmask of each LHS of rhs
+        """
+        if rhs not in self._masks:
+            self._masks[rhs] = tuple(self.to_mask(lhs) for lhs in self._lhss[rhs])
+        return self._masks[rhs]
+
+    def find_closure(self, attrs):
+        """
+        Finds the closure of attrs under the relations in self.
+
+        Arguments:
+            attrs (iterable[str]) : attributes to find the closure of
+
+        Returns:
+            closure (set[str]) : the attributes that can be determined from
+            the attributes in attrs
+        """
+        if self._closure is None:
+            self._closure = Closure([(lhs, rhs) for rhs in self._lhss for lhs in self._lhss[rhs]])
+        return self._closure.find(attrs)
 
     def all_attrs(self):
         """
@@ -437,7 +779,7 @@ class Dependencies(object):
         Returns:
             all_attrs (set[str]) : all attributes
         """
-        return set(self._data.keys())
+        return set(self._lhss.keys())
 
     def tuple_relations(self):
         """
@@ -446,9 +788,49 @@ class Dependencies(object):
         Returns:
             relations (list[(list[str], str)]) : relations stored in self
         """
-        result = []
-        for rhs in self._data:
-            result = result + [(lhs, rhs) for lhs in self._data[rhs]]
+        return [(list(lhs), rhs) for rhs in self._lhss for lhs in self._lhss[rhs]]
+
+    def split(self, lhs_dep):
+        """
+        Splits the relations in self into two groups so that lhs_dep is the
+        primary key of the new group. The attributes determined by a subset
+        of lhs_dep move to the new group, and each group drops the LHSs
+        containing attributes that are only in the other one. The groups
+        share the LHS tuples and bitmasks left unchanged.
+
+        Arguments:
+            lhs_dep (list[str]) : attributes to be the new group's primary key
+
+        Returns:
+            new_groups ((Dependencies, Dependencies)) : the old group, with
+            the same primary key, and the new group
+        """
+        key = self.to_mask(lhs_dep)
+        old_lhss = {}
+        new_lhss = {attr: self._lhss[attr] for attr in lhs_dep}
+        new_rhs = 0
+        for rhs, lhss in self._lhss.items():
+            if any(mask & key == mask for mask in self.lhs_masks(rhs)):
+                new_lhss[rhs] = lhss
+                new_rhs |= self.to_mask([rhs])
+            else:
+                old_lhss[rhs] = lhss
+        old_rhs = self.to_mask(old_lhss) & ~key
+        old = Dependencies._from_lhss(self._drop_lhss(old_lhss, new_rhs), self.get_prim_key(), self)
+        new = Dependencies._from_lhss(self._drop_lhss(new_lhss, old_rhs), lhs_dep, self)
+        return old, new
+
+    def _drop_lhss(self, lhss, attrs):
+        """
+        Returns lhss without the LHSs that contain any of the attributes in
+        the bitmask attrs, keeping the tuples that have none of them.
+        """
+        result = {}
+        for rhs, rhs_lhss in lhss.items():
+            masks = self.lhs_masks(rhs)
+            if any(mask & attrs for mask in masks):
+                rhs_lhss = tuple(lhs for lhs, mask in zip(rhs_lhss, masks) if not mask & attrs)
+            result[rhs] = rhs_lhss
         return result
 
     def remove_implied_extroneous(self):
@@ -462,67 +844,159 @@ class Dependencies(object):
             A --> B
             A --> C
         """
-        rels = self.tuple_relations()
-        for lhs, rhs in rels[:]:
-            y = lhs[:]
-            for attr in lhs:
-                y_ = y[:]
-                y_.remove(attr)
-                if rhs in find_closure(rels, y_):
-                    y.remove(attr)
-            rels.remove((lhs, rhs))
-            rels.append((y, rhs))
-            self._data[rhs].remove(lhs)
-            self._data[rhs].append(y)
-
-        # remove dups
-        for rhs in self._data:
-
-            i = 0
-            while i < len(self._data[rhs]):
-                if self._data[rhs][i] in self._data[rhs][i + 1:]:
-                    self._data[rhs].pop(i)
-                else:
-                    i += 1
+        # replacing a lhs with a subset that determines the same rhs does
+        # not change any closure, so the closures of the relations at the
+        # start can be used throughout
+        reduced = {}
+        for rhs, lhss in self._lhss.items():
+            new_lhss = []
+            for lhs in lhss:
+                y = list(lhs)
+                for attr in lhs:
+                    y_ = y[:]
+                    y_.remove(attr)
+                    if rhs in self.find_closure(y_):
+                        y.remove(attr)
+                new_lhss.append(tuple(y))
+            # remove dups, keeping the last of each
+            seen = set()
+            kept = []
+            for lhs in reversed(new_lhss):
+                if lhs not in seen:
+                    seen.add(lhs)
+                    kept.append(lhs)
+            reduced[rhs] = tuple(reversed(kept))
+        for rhs, lhss in reduced.items():
+            if lhss != self._lhss[rhs]:
+                self._set_lhss(rhs, lhss)
+
+    def minimal_cover(self):
+        """
+        Reduces the relations in self to a minimal cover, with the same
+        closures: the extraneous attributes are removed from every LHS as in
+        remove_implied_extroneous, then every relation implied by the
+        remaining others is removed, in order. Each check for a redundant
+        relation is a single closure search that stops once its RHS is found.
 
-    def find_candidate_keys(self):
+        Example:
+            A --> B
+            B --> C
+            AB --> C
+            becomes
+            A --> B
+            B --> C
+        """
+        self.remove_implied_extroneous()
+        rels = [(lhs, rhs) for rhs in self._lhss for lhs in self._lhss[rhs]]
+        closure = Closure(rels)
+        redundant = set(i for i, (lhs, rhs) in enumerate(rels) if closure.is_redundant(i, lhs))
+        if not redundant:
+            return
+        i = 0
+        for rhs, lhss in list(self._lhss.items()):
+            kept = tuple(lhs for j, lhs in enumerate(lhss, i) if j not in redundant)
+            i += len(lhss)
+            if len(kept) != len(lhss):
+                self._set_lhss(rhs, kept)
+
+    def find_candidate_keys(self, max_keys=None, max_key_size=None):
         """
         Returns all candidate keys in self. A candidate key is a minimal
         set of attributes whose closure is all attributes in the table.
 
+        Arguments:
+            max_keys (int, optional) : largest number of keys to return, all
+            of them if None
+
+            max_key_size (int, optional) : largest number of attributes in
+            the keys to return, unbounded if None
+
         Returns:
             cand_keys (list[set[str]]) : list of candidate keys for self
         """
+        return list(self.iter_candidate_keys(max_keys, max_key_size))
 
-        rhs_attrs = set([rhs for rhs in self._data if len(self._data[rhs]) > 0])
-        lhs_attrs = set()
-        for rhs in self._data:
-            for lhs in self._data[rhs]:
-                lhs_attrs.update(set(lhs))
-
-        lhs_only = lhs_attrs.difference(rhs_attrs)
-        all_attrs = set(self._data.keys())
-        rhs_only = rhs_attrs.difference(lhs_attrs)
-        lhs_and_lhs = all_attrs.difference(lhs_only.union(rhs_only))
-        rels = self.tuple_relations()
-
-        if find_closure(rels, list(lhs_only)) == all_attrs:
-            return [lhs_only]
-
-        cand_keys = []
+    def iter_candidate_keys(self, max_keys=None, max_key_size=None):
+        """
+        Generates the candidate keys in self with the algorithm of Lucchesi
+        and Osborn (1978), in time polynomial in the number of keys rather
+        than in the number of attribute combinations. The first key is all
+        the attributes, reduced to a minimal key. For every key K and
+        relation X --> A with A in K, X + (K - A) is also a superkey, and
+        unless it contains a key found already, it is reduced to a new key.
+        Every key is found this way.
 
-        for i in range(1, len(lhs_and_lhs) + 1):
-            combos = combinations(lhs_and_lhs, i)
-            for comb in combos:
-                if find_closure(rels, list(lhs_only.union(comb))) == all_attrs:
-                    cand_keys.append(lhs_only.union(comb))
+        That search doesn't find the smallest keys first, so the keys of one
+        or two attributes are generated before it, and a caller that stops
+        after max_keys keys still sees the smallest keys if they are that
+        small. Larger keys come in no particular order of size.
 
-        for x in cand_keys[:]:
-            for y in cand_keys[:]:
-                if x.issuperset(y) and x is not y:
-                    cand_keys.remove(x)
-                    break
-        return cand_keys
+        Arguments:
+            max_keys (int, optional) : number of keys after which to stop,
+            all of them if None
+
+            max_key_size (int, optional) : largest number of attributes in
+            the keys to generate, unbounded if None. Larger keys are still
+            found, since smaller keys can be derived from them.
+
+        Yields:
+            cand_key (set[str]) : a candidate key of self
+        """
+        all_attrs = set(self._lhss.keys())
+        rels = [(set(lhs), rhs) for lhs, rhs in self.tuple_relations()]
+        keys = self._small_keys(all_attrs, rels)
+        first = self._reduce_key(all_attrs, all_attrs)
+        if first not in keys:
+            keys.append(first)
+        found = 0
+        i = 0
+        while i < len(keys):
+            key = keys[i]
+            i += 1
+            if max_key_size is None or len(key) <= max_key_size:
+                yield set(key)
+                found += 1
+                if max_keys is not None and found >= max_keys:
+                    return
+            for lhs, rhs in rels:
+                if rhs not in key:
+                    continue
+                superkey = lhs | (key - {rhs})
+                if not any(other <= superkey for other in keys):
+                    keys.append(self._reduce_key(superkey, all_attrs))
+
+    def _small_keys(self, all_attrs, rels):
+        """
+        Returns the keys of one or two attributes, in the order of the
+        table. Every key contains the attributes that are not the RHS of any
+        relation, so only sets containing them are checked.
+        """
+        core = all_attrs - set(rhs for lhs, rhs in rels)
+        if len(core) > 2:
+            return []
+        attrs = list(self._lhss)
+        if core:
+            candidates = [core] + [core | {attr} for attr in attrs if attr not in core]
+        else:
+            candidates = [{attr} for attr in attrs] + [set(pair) for pair in combinations(attrs, 2)]
+        keys = []
+        for cand in candidates:
+            if len(cand) > 2 or any(key <= cand for key in keys):
+                continue
+            if self.find_closure(cand) == all_attrs:
+                keys.append(frozenset(cand))
+        return keys
+
+    def _reduce_key(self, superkey, all_attrs):
+        """
+        Returns a minimal key contained in superkey, removing the attributes
+        in the order of the table.
+        """
+        key = set(superkey)
+        for attr in self._lhss:
+            if attr in key and self.find_closure(key - {attr}) == all_attrs:
+                key.remove(attr)
+        return frozenset(key)
 
     # def find_candidate_keys(self):
     #     """
@@ -628,12 +1102,12 @@ class Dependencies(object):
         key_attrs = set()
         for key in cand_keys:
             key_attrs.update(key)
-        all_attrs = set(self._data.keys())
+        all_attrs = set(self._lhss.keys())
         rels = self.tuple_relations()
 
         for lhs, rhs in rels:
             if rhs not in key_attrs:
-                if find_closure(rels, lhs) != all_attrs:
+                if self.find_closure(lhs) != all_attrs:
                     acc = False
                     for key in cand_keys:
                         if set(lhs).issubset(key):
@@ -651,8 +1125,7 @@ class Dependencies(object):
         Returns:
             is_equiv (bool) : True if equivalent, False otherwise
         """
-        tups = self.tuple_relations()
-        return find_closure(tups, [one]) == find_closure(tups, [two])
+        return self.find_closure([one]) == self.find_closure([two])
 
 
 def find_closure(rel, attrs):
@@ -667,151 +1140,969 @@ def find_closure(rel, attrs):
         closure (set[str]) : attrs' closure, aka the attributes that can be
         determined from the attributes in attrs
     """
-    def helper(set_attr, rel):
-        if rel == []:
-            return set(set_attr)
-        for dep_attrs, dep in rel:
-            if set(dep_attrs).issubset(set_attr):
-                rel_ = rel[:]
-                rel_.remove((dep_attrs, dep))
-                return helper(set_attr + [dep], rel_)
-        return set_attr
-    return set(helper(attrs[:], rel))
+    return Closure(rel).find(attrs)
 
 
-class Masks(object):
+class Closure(object):
     """
-    Stores the created masks of a dataframe.
+    Finds closures of attribute sets under a list of relations in time
+    linear in the size of the relations, with the LinClosure algorithm
+    (Beeri and Bernstein, 1979). Every relation counts the attributes of its
+    LHS not yet in the closure, and every attribute lists the relations
+    whose LHS contains it, so each relation is looked at once per attribute
+    of its LHS. The counts are shared by every search, which undoes only
+    the counts it changed, so a search doesn't copy them. Found closures
+    are memoized until a redundant relation is removed.
 
     Attributes:
-        _masks
+        _rhss
+        _lhs_sizes (list[int]) : number of attributes of the LHS of each
+        relation not yet in the closure being searched
+        _empty (list[int]) : positions of the relations with an empty LHS
+        _by_attr
+        _removed (set[int]) : positions of the relations removed as redundant
+        _memo
     """
 
-    def __init__(self, columns):
+    def __init__(self, rels):
         """
-        Creates a new Masks.
+        Creates a Closure.
 
         Arguments:
-            columns (list[str]) : the columns of the dataframe the masks are for
+            rels (list[(list[str], str)]) : relationships to find closures under
+        """
+        self._rhss = []
+        self._lhs_sizes = []
+        self._empty = []
+        self._by_attr = {}
+        for i, (lhs, rhs) in enumerate(rels):
+            lhs = set(lhs)
+            self._rhss.append(rhs)
+            self._lhs_sizes.append(len(lhs))
+            if not lhs:
+                self._empty.append(i)
+            for attr in lhs:
+                self._by_attr.setdefault(attr, []).append(i)
+        self._removed = set()
+        self._memo = {}
+
+    def find(self, attrs):
         """
-        self._masks = {}
-        for col in columns:
-            self._masks[col] = {}
-
-    def add_mask(self, col, val, mask):
-        """
-        Adds mask for column col and value val.
-
-        Arguments:
-            col (str) : name of column mask is for
-            val (_) : value for that column mask is for
-            mask (pandas.core.series.Series or numpy.ndarray) : mask for df[col] == val
-        """
-        self._masks[col][val] = mask
-
-    def get_mask(self, col, val):
-        """
-        Gets mask for column col and value val.
+        Finds the closure of attrs.
+
+        Arguments:
+            attrs (iterable[str]) : attributes to find the closure of
+
+        Returns:
+            closure (set[str]) : the attributes that can be determined from
+            the attributes in attrs
+        """
+        key = frozenset(attrs)
+        if key not in self._memo:
+            self._memo[key] = frozenset(self._close(key))
+        return set(self._memo[key])
+
+    def is_redundant(self, i, lhs):
+        """
+        Returns whether relation i, whose LHS is lhs, is implied by the other
+        relations, and if so removes it, so it is not used to imply later
+        ones. The search stops as soon as the RHS of relation i is found.
 
         Arguments:
-            col (str) : name of column mask is for
-            val (_) : value for that column mask is for
-
-        Returns:
-            mask (pandas.core.series.Series or numpy.ndarray) : mask for df[col] == val
-        """
-        if val in self._masks[col]:
-            return self._masks[col][val]
-        return None
-
-# class BitIndexSet(object):
-#     """
-#     A BitIndexSet represents a set where each of the elements are an integer.
-#     The size of the set is the greatest element possible for the given situation.
-#     """
-
-#     def __init__(self, size, attr_set=set()):
-#         self._data = 0
-#         self._size = size
-#         for attr in attr_set:
-#             self._data += 1 << (attr)
-
-#     def _get_bit(self, i):
-#         return (self._data >> i) % 2
-
-#     def _remove_bit(self, i):
-#         if self._get_bit(i) == 0:
-#             return
-#         self._data -= 1 << i
-
-#     def _add_bit(self, i):
-#         if self._get_bit(i) == 1:
-#             return
-#         self._data += 1 << i
-
-#     def get_size(self):
-#         return self._size
-
-#     def to_set(self):
-#         """ Returns self as a Set object"""
-#         bits = self._data
-#         new_set = set()
-#         for i in range(self._size):
-#             if bits % 2 == 1:
-#                 new_set.add(i)
-#             bits = bits >> 1
-#         return new_set
-
-#     def is_subset(self, set2):
-#         """ True if self is a subset of set2"""
-#         for i in range(self._size):
-#             if self._get_bit(i) == 1 and set2._get_bit(i) != 1:
-#                 return False
-#         return True
-
-#     def is_superset(self, set2):
-#         """ True if self is a superset of set2"""
-#         for i in range(self._size):
-#             if set2._get_bit(i) == 1 and self._get_bit(i) != 1:
-#                 return False
-#         return True
-
-#     def get_compliment(self, rhs):
-#         """
-#         Returns the compliment of the current set, except for the
-#         rhs which remains 0 (not in the set)
-#         """
-#         new_set = BitIndexSet(self._size)
-#         for i in range(self._size):
-#             if self._get_bit(i) == 0 and i != rhs:
-#                 new_set._data += 1 << i
-#         return new_set
-
-#     def difference(self, set2):
-#         """Removes all elements in set2, from self (if exists in self)"""
-#         for i in range(set2._size):
-#             if set2._get_bit(i) == 1:
-#                 self._remove_bit(i)
-
-#     def add_new(self, attrs):
-#         """ Returns new set that contains all attributes of self, and all
-#         in attrs--a Set() object"""
-#         at = self.to_set()
-#         return BitIndexSet(self._size, at.union(attrs))
-
-#     def __eq__(self, set2):
-#         if not isinstance(set2, BitIndexSet):
-#             return False
-#         return self._data == set2._data
-
-#     def __hash__(self):
-#         return hash(self._data)
-
-#     def __iter__(self):
-#         return iter(self.to_set())
-
-#     def __str__(self):
-#         return str(self.to_set())
-
-#     def __len__(self):
-#         return len(self.to_set())
+            i (int) : position of the relation in the relations self was
+            created with
+
+            lhs (iterable[str]) : the LHS of relation i
+
+        Returns:
+            is_redundant (bool) : True if relation i was removed
+        """
+        rhs = self._rhss[i]
+        if rhs in self._close(lhs, skip=i, target=rhs):
+            self._removed.add(i)
+            self._memo = {}
+            return True
+        return False
+
+    def _close(self, attrs, skip=None, target=None):
+        missing = self._lhs_sizes
+        changed = []
+        closure = set(attrs)
+        closure.update(self._rhss[i] for i in self._empty if self._is_used(i, skip))
+        todo = list(closure)
+        try:
+            while todo and target not in closure:
+                for i in self._by_attr.get(todo.pop(), ()):
+                    missing[i] -= 1
+                    changed.append(i)
+                    if missing[i] == 0 and self._rhss[i] not in closure and self._is_used(i, skip):
+                        closure.add(self._rhss[i])
+                        todo.append(self._rhss[i])
+        finally:
+            for i in changed:
+                missing[i] += 1
+        return closure
+
+    def _is_used(self, i, skip):
+        return i != skip and i not in self._removed
+
+
+class RowIndex(object):
+    """
+    Maps each value of a column, or each combination of values of several
+    columns, to the ids of the rows that have it. The row ids are stored in
+    a single array sorted by value, with the offset at which the rows of
+    each value begin, so memory is proportional to the number of rows and
+    a lookup takes time proportional to the number of rows found.
+
+    Attributes:
+        rows (numpy.ndarray) : row ids, grouped by value
+        starts (numpy.ndarray) : offset in rows at which the rows of each
+        value code begin, with the number of rows appended
+        _codes
+    """
+
+    def __init__(self, codes, values):
+        """
+        Creates a RowIndex.
+
+        Arguments:
+            codes (numpy.ndarray) : integer code of the value of each row
+
+            values (iterable) : the value of each code
+        """
+        self.rows = numpy.argsort(codes, kind='stable')
+        self.starts = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(codes, minlength=len(values)))))
+        self._codes = {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def from_df(cls, df, columns):
+        """
+        Returns the RowIndex of the combinations of values of columns in df.
+
+        Arguments:
+            df (pd.DataFrame) : the data
+
+            columns (list[str]) : columns to index the rows by. A single
+            column's values are looked up as they are, several columns' as
+            tuples.
+
+        Returns:
+            index (RowIndex) : the index of the rows of df
+        """
+        if len(columns) == 1:
+            codes, values = pd.factorize(df[columns[0]])
+        else:
+            codes, values = pd.factorize(pd.MultiIndex.from_frame(df[columns]))
+        return cls(codes, list(values))
+
+    def get_rows(self, value):
+        """
+        Returns the ids of the rows with value.
+
+        Arguments:
+            value (_) : value, or tuple of values, to look up
+
+        Returns:
+            rows (numpy.ndarray) : ids of the rows with value, empty if
+            there are none
+        """
+        code = self._codes.get(value)
+        if code is None:
+            return self.rows[:0]
+        return self.rows[self.starts[code]:self.starts[code + 1]]
+
+
+def encode_column(col):
+    """
+    Encodes the values of a column as dense integer codes. Equal values,
+    including missing values, receive equal codes.
+
+    Arguments:
+        col (pd.Series) : column to encode
+
+    Returns:
+        codes (numpy.ndarray) : integer code of each row's value
+    """
+    codes, uniques = pd.factorize(col)
+    codes[codes == -1] = len(uniques)
+    return codes
+
+
+class ValueCodes(object):
+    """
+    Gives the values of a column dense integer codes, in the order they are
+    first seen, keeping the same codes as more rows are encoded. Missing
+    values all receive the same code. Each batch of rows is factorized
+    first, so only its distinct values are looked up in the hash map of the
+    values seen before.
+
+    Attributes:
+        _codes (dict) : the code of each value seen so far
+        _missing (int or None) : the code of missing values, None if there
+        were none
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._missing = None
+
+    def __len__(self):
+        return len(self._codes) + (self._missing is not None)
+
+    def encode(self, col):
+        """
+        Returns the codes of the values of col, giving new values the next
+        free codes.
+
+        Arguments:
+            col (pd.Series) : column to encode
+
+        Returns:
+            codes (numpy.ndarray) : integer code of each row's value
+        """
+        local, uniques = pd.factorize(col)
+        uniques = list(uniques)
+        lookup = numpy.empty(len(uniques) + 1, dtype=numpy.int64)
+        missing = numpy.flatnonzero(local == -1)
+        # the position among the uniques at which missing values first occur
+        missing_at = -1
+        if len(missing) > 0:
+            missing_at = local[:missing[0]].max() + 1 if missing[0] > 0 else 0
+        for k in range(len(uniques) + 1):
+            if k == missing_at:
+                if self._missing is None:
+                    self._missing = len(self)
+                lookup[-1] = self._missing
+            if k == len(uniques):
+                break
+            code = self._codes.get(uniques[k])
+            if code is None:
+                code = self._codes[uniques[k]] = len(self)
+            lookup[k] = code
+        return lookup[local]
+
+
+def code_dtype(n_values):
+    """
+    Returns the smallest integer dtype that holds the codes of n_values
+    distinct values.
+    """
+    for dtype in (numpy.int8, numpy.int16, numpy.int32):
+        if n_values <= numpy.iinfo(dtype).max + 1:
+            return numpy.dtype(dtype)
+    return numpy.dtype(numpy.int64)
+
+
+# number of rows copied at a time when a CodeStore rewrites its files
+COPY_ROWS = 1000000
+
+
+class CodeStore(object):
+    """
+    Encodes a table chunk by chunk, giving equal values equal codes across
+    chunks. The codes of each column are appended to a temporary file and
+    read back memory mapped, so the whole table never has to be in memory.
+    Each file uses the smallest integer dtype that holds the codes of its
+    column, and is rewritten with a larger one when the column gains too
+    many distinct values.
+
+    Attributes:
+        columns (list[str]) : names of the columns
+        n_rows (int) : number of rows appended so far
+        _values (list[ValueCodes]) : the codes of the values in each column
+        _dtypes (list[numpy.dtype]) : dtype of the codes in each file
+        _files (list[file]) : temporary file holding the codes of each column
+        _directory
+    """
+
+    def __init__(self, columns, directory=None):
+        """
+        Creates an empty CodeStore.
+
+        Arguments:
+            columns (list[str]) : names of the columns
+
+            directory (str, optional) : directory to put the temporary files
+            in, the system default if None
+        """
+        self.columns = list(columns)
+        self.n_rows = 0
+        self._values = [ValueCodes() for _ in self.columns]
+        self._dtypes = [code_dtype(0) for _ in self.columns]
+        self._files = [tempfile.TemporaryFile(dir=directory) for _ in self.columns]
+        self._directory = directory
+
+    def append(self, df):
+        """
+        Encodes the rows of df and appends their codes to the store.
+
+        Arguments:
+            df (pd.DataFrame) : the rows to add, with the same columns as
+            the store
+        """
+        if list(df.columns) != self.columns:
+            raise ValueError('Every chunk must have the same columns')
+        for i, col in enumerate(self.columns):
+            codes = self._values[i].encode(df[col])
+            dtype = code_dtype(len(self._values[i]))
+            if dtype.itemsize > self._dtypes[i].itemsize:
+                self._rewrite(i, dtype)
+            codes.astype(self._dtypes[i]).tofile(self._files[i])
+        self.n_rows += df.shape[0]
+
+    def codes(self):
+        """
+        Returns the codes of every column appended so far.
+
+        Returns:
+            codes (dict[str --> numpy.ndarray]) : memory mapped codes of
+            each column
+        """
+        return {col: self._column(i) for i, col in enumerate(self.columns)}
+
+    def _column(self, i):
+        f = self._files[i]
+        f.flush()
+        if self.n_rows == 0:
+            return numpy.empty(0, dtype=self._dtypes[i])
+        return numpy.memmap(f, dtype=self._dtypes[i], mode='r', shape=(self.n_rows,))
+
+    def keep(self, rows):
+        """
+        Keeps only the given rows in the store, copying the codes of each
+        column to a new file.
+
+        Arguments:
+            rows (numpy.ndarray) : ids of the rows to keep, in increasing
+            order
+        """
+        for i in range(len(self.columns)):
+            self._rewrite(i, self._dtypes[i], rows)
+        self.n_rows = len(rows)
+
+    def _rewrite(self, i, dtype, rows=None):
+        """
+        Copies the codes of column i, or only those of the given rows, to a
+        new file with the given dtype, COPY_ROWS rows at a time.
+        """
+        old = self._column(i)
+        f = tempfile.TemporaryFile(dir=self._directory)
+        n = len(old) if rows is None else len(rows)
+        for start in range(0, n, COPY_ROWS):
+            part = old[start:start + COPY_ROWS] if rows is None else old[rows[start:start + COPY_ROWS]]
+            part.astype(dtype).tofile(f)
+        self._files[i].close()
+        self._files[i] = f
+        self._dtypes[i] = numpy.dtype(dtype)
+
+
+class StrippedPartition(object):
+    """
+    Represents the equivalence classes of rows that agree on a set of
+    attributes, with all singleton classes removed (see TANE section 3.2).
+    The classes are stored contiguously: rows[starts[i]:starts[i + 1]]
+    are the row ids of the i-th class.
+
+    Attributes:
+        rows (numpy.ndarray) : row ids, grouped by equivalence class
+        starts (numpy.ndarray) : offset in rows at which each class begins
+    """
+
+    def __init__(self, rows, starts):
+        """
+        Creates a StrippedPartition.
+
+        Arguments:
+            rows (numpy.ndarray) : row ids, grouped by equivalence class
+            starts (numpy.ndarray) : offset in rows at which each class begins
+        """
+        self.rows = rows
+        self.starts = starts
+
+    @classmethod
+    def from_codes(cls, codes):
+        """
+        Returns the stripped partition of a single encoded column.
+
+        Arguments:
+            codes (numpy.ndarray) : integer codes of the column
+
+        Returns:
+            partition (StrippedPartition) : the column's stripped partition
+        """
+        rows = numpy.argsort(codes, kind='stable')
+        keys = codes[rows]
+        return cls._from_sorted(rows, keys[1:] != keys[:-1])
+
+    @classmethod
+    def _from_sorted(cls, rows, boundaries):
+        """
+        Builds a stripped partition from row ids sorted by class, where
+        boundaries[i] is True if rows[i + 1] begins a new class.
+        """
+        n = len(rows)
+        if n == 0:
+            return cls(rows, numpy.zeros(0, dtype=numpy.int64))
+        starts = numpy.flatnonzero(numpy.concatenate(([True], boundaries)))
+        sizes = numpy.diff(numpy.append(starts, n))
+        keep = sizes > 1
+        rows = rows[numpy.repeat(keep, sizes)]
+        sizes = sizes[keep]
+        starts = numpy.cumsum(sizes) - sizes
+        return cls(rows, starts)
+
+    def labels(self):
+        """
+        Returns the class number of each entry in self.rows.
+
+        Returns:
+            labels (numpy.ndarray) : class number for every entry of rows
+        """
+        sizes = numpy.diff(numpy.append(self.starts, len(self.rows)))
+        return numpy.repeat(numpy.arange(len(self.starts)), sizes)
+
+    def refine(self, codes):
+        """
+        Returns the product of self with the partition of an encoded
+        column, i.e. the stripped partition of self's attributes plus the
+        column.
+
+        Arguments:
+            codes (numpy.ndarray) : integer codes of the column
+
+        Returns:
+            partition (StrippedPartition) : the refined partition
+        """
+        labels = self.labels()
+        values = codes[self.rows]
+        order = numpy.lexsort((values, labels))
+        labels = labels[order]
+        values = values[order]
+        boundaries = (labels[1:] != labels[:-1]) | (values[1:] != values[:-1])
+        return StrippedPartition._from_sorted(self.rows[order], boundaries)
+
+    def g3_error(self, codes, weights=None):
+        """
+        Returns the g3 error of the dependency self's attributes --> column,
+        the minimum number of rows that have to be removed for the dependency
+        to hold: for every class, its size minus the count of its most
+        frequent value in the column. Computed in a single sorted pass.
+
+        Arguments:
+            codes (numpy.ndarray) : integer codes of the column
+
+            weights (numpy.ndarray, optional) : number of times each row
+            occurs, every row once if None
+
+        Returns:
+            error (int) : number of rows violating the dependency
+        """
+        if len(self.rows) == 0:
+            return 0
+        labels = self.labels()
+        values = codes[self.rows]
+        order = numpy.lexsort((values, labels))
+        labels = labels[order]
+        values = values[order]
+        run_starts = numpy.flatnonzero(numpy.concatenate(
+            ([True], (labels[1:] != labels[:-1]) | (values[1:] != values[:-1]))))
+        if weights is None:
+            total = len(self.rows)
+            run_sizes = numpy.diff(numpy.append(run_starts, len(values)))
+        else:
+            row_weights = weights[self.rows[order]]
+            total = row_weights.sum()
+            run_sizes = numpy.add.reduceat(row_weights, run_starts)
+        run_labels = labels[run_starts]
+        class_starts = numpy.flatnonzero(numpy.concatenate(([True], run_labels[1:] != run_labels[:-1])))
+        return int(total - numpy.maximum.reduceat(run_sizes, class_starts).sum())
+
+    def num_classes(self):
+        """
+        Returns the number of non-singleton equivalence classes.
+        """
+        return len(self.starts)
+
+    def error(self):
+        """
+        Returns the number of rows that would have to be removed for every
+        class to become a singleton. Two attribute sets X and Y = X + {A}
+        satisfy X --> A exactly when error(X) == error(Y).
+        """
+        return len(self.rows) - len(self.starts)
+
+
+class BoundedCache(object):
+    """
+    A cache of values of known sizes, which evicts values once their total
+    size is over max_bytes. Values are evicted by the GreedyDual-Size
+    policy: the priority of a value is its cost to rebuild per byte, plus an
+    inflation that rises to the priority of each evicted value. Values that
+    are cheap to store but expensive to rebuild are kept longest, and values
+    that are not used lose priority to the values used since.
+
+    Attributes:
+        max_bytes (int or None) : largest total size of the values, unbounded
+        if None
+        nbytes (int) : total size of the values in the cache
+        evictions (int) : number of values evicted
+        _values
+        _priorities
+        _heap
+        _inflation
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        Creates an empty BoundedCache.
+
+        Arguments:
+            max_bytes (int, optional) : largest total size of the values,
+            unbounded if None
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._values = {}
+        self._priorities = {}
+        self._heap = []
+        self._inflation = 0.0
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """
+        Returns the value stored under key, or None if there is none, and
+        raises its priority.
+
+        Arguments:
+            key (_) : key of the value
+
+        Returns:
+            value (_ or None) : the value stored under key
+        """
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if self.max_bytes is not None:
+            self._prioritize(key, entry[1], entry[2])
+        return entry[0]
+
+    def put(self, key, value, nbytes, cost):
+        """
+        Stores value under key, evicting values if the cache is then larger
+        than max_bytes. Values larger than max_bytes are not stored.
+
+        Arguments:
+            key (_) : key of the value
+
+            value (_) : the value to store
+
+            nbytes (int) : size of value
+
+            cost (float) : cost of computing value again
+        """
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        if key in self._values:
+            self.nbytes -= self._values[key][1]
+        self._values[key] = (value, nbytes, cost)
+        self.nbytes += nbytes
+        if self.max_bytes is not None:
+            self._prioritize(key, nbytes, cost)
+            self._evict()
+
+    def set_max_bytes(self, max_bytes):
+        """
+        Sets max_bytes, evicting values if the cache is larger.
+
+        Arguments:
+            max_bytes (int or None) : largest total size of the values,
+            unbounded if None
+        """
+        if max_bytes is not None and self.max_bytes is None:
+            for key, (_, nbytes, cost) in self._values.items():
+                self._prioritize(key, nbytes, cost)
+        self.max_bytes = max_bytes
+        if max_bytes is not None:
+            self._evict()
+
+    def clear(self):
+        """
+        Removes every value.
+        """
+        self._values = {}
+        self._priorities = {}
+        self._heap = []
+        self.nbytes = 0
+
+    def _prioritize(self, key, nbytes, cost):
+        priority = self._inflation + cost / max(nbytes, 1)
+        self._priorities[key] = priority
+        heapq.heappush(self._heap, (priority, next(_ticks), key))
+        # drop the outdated heap entries of values used again
+        if len(self._heap) > 2 * len(self._priorities) + 64:
+            self._heap = [(priority, next(_ticks), key) for key, priority in self._priorities.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            if self._priorities.get(key) != priority:
+                continue
+            del self._priorities[key]
+            self.nbytes -= self._values.pop(key)[1]
+            self._inflation = priority
+            self.evictions += 1
+
+
+# tie breakers for BoundedCache priorities, so keys are never compared
+_ticks = count()
+
+# distinguishes the partitions of the PartitionCaches sharing a BoundedCache
+_cache_ids = count()
+
+# estimated bytes of a stripped partition besides its arrays
+PARTITION_OVERHEAD_BYTES = 200
+
+
+class PartitionCache(object):
+    """
+    Stores the integer-coded columns of a dataframe, and computes and stores
+    the stripped partitions of attribute sets. Attribute sets are bitmasks
+    where bit i is the i-th column. The partition of a set is built by
+    refining the cached partition of one of its subsets. Partitions are
+    kept in a BoundedCache, shared with the cache of the sample, so their
+    memory can be bounded; an evicted partition is computed again when
+    needed.
+
+    Attributes:
+        columns
+        n_rows
+        weights (numpy.ndarray or None) : number of times each row occurs in
+        the data, every row once if None
+        sample (PartitionCache or None) : cache over a subset of the rows,
+        used to cheaply refute candidate dependencies
+        store (CodeStore or None) : the store whose files hold the codes,
+        None if they are in memory
+        hits (int) : number of partitions and sizes found in the cache
+        misses (int) : number of partitions and sizes that had to be computed
+        _codes
+        _partitions (BoundedCache) : partitions keyed by _id and attributes
+        _id
+        _sizes
+    """
+
+    def __init__(self, codes, weights=None):
+        """
+        Creates a PartitionCache.
+
+        Arguments:
+            codes (dict[str --> numpy.ndarray]) : integer codes of each column,
+            all of the same length
+
+            weights (numpy.ndarray, optional) : number of times each row
+            occurs, every row once if None
+        """
+        self.columns = list(codes.keys())
+        self.n_rows = len(next(iter(codes.values()))) if codes else 0
+        self.weights = weights
+        self._codes = list(codes.values())
+        self._partitions = BoundedCache()
+        self._id = next(_cache_ids)
+        self._sizes = {}
+        self.sample = None
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_df(cls, df):
+        """
+        Returns a PartitionCache for the columns of df.
+
+        Arguments:
+            df (pd.DataFrame) : dataframe the partitions are for
+
+        Returns:
+            partitions (PartitionCache) : cache over the encoded columns
+        """
+        codes = {}
+        for col in df.columns:
+            codes[col] = encode_column(df[col])
+        cache = cls(codes)
+        cache.n_rows = df.shape[0]
+        return cache
+
+    @classmethod
+    def from_chunks(cls, chunks, directory=None):
+        """
+        Returns a PartitionCache for a table given in chunks. The chunks are
+        encoded one at a time into a CodeStore, so only one chunk and the
+        encoded columns are ever held in memory.
+
+        Arguments:
+            chunks (iterable[pd.DataFrame]) : the rows of the table, every
+            chunk with the same columns
+
+            directory (str, optional) : directory for the files of the codes,
+            the system default if None
+
+        Returns:
+            partitions (PartitionCache) : cache over the encoded columns
+        """
+        store = None
+        for chunk in chunks:
+            if store is None:
+                store = CodeStore(chunk.columns, directory)
+            store.append(chunk)
+        if store is None:
+            raise ValueError('There are no chunks to find dependencies in')
+        cache = cls(store.codes())
+        cache.n_rows = store.n_rows
+        cache.store = store
+        return cache
+
+    def take(self, rows):
+        """
+        Returns a new PartitionCache over only the given rows.
+
+        Arguments:
+            rows (numpy.ndarray) : ids of the rows to keep
+
+        Returns:
+            partitions (PartitionCache) : cache over the selected rows
+        """
+        weights = None if self.weights is None else self.weights[rows]
+        partitions = PartitionCache(dict(zip(self.columns, (codes[rows] for codes in self._codes))), weights)
+        partitions._partitions = self._partitions
+        return partitions
+
+    def set_max_bytes(self, max_bytes):
+        """
+        Bounds the memory of the partitions kept by self and its sample.
+
+        Arguments:
+            max_bytes (int or None) : largest total size in bytes of the
+            cached partitions, unbounded if None
+        """
+        self._partitions.set_max_bytes(max_bytes)
+
+    def max_bytes(self):
+        """
+        Returns the largest total size of the cached partitions, None if
+        unbounded.
+        """
+        return self._partitions.max_bytes
+
+    def drop_duplicates(self):
+        """
+        Keeps only the first of each group of equal rows, weighted by the
+        number of rows in the group. The classes of every attribute set, and
+        so the exact dependencies, are the same for the distinct rows, and the
+        g3 errors are the same when rows are counted by weight. Computed
+        partitions are dropped, since their row ids change. Codes kept in
+        the files of a CodeStore are written back to new files rather than
+        loaded into memory.
+        """
+        if self.n_rows == 0 or not self._codes:
+            return
+        part = StrippedPartition.from_codes(self._codes[0])
+        for codes in self._codes[1:]:
+            if part.num_classes() == 0:
+                break
+            part = part.refine(codes)
+        if part.num_classes() == 0:
+            return
+        weights = numpy.ones(self.n_rows, dtype=numpy.int64) if self.weights is None else self.weights
+        firsts = part.rows[part.starts]
+        group_weights = numpy.add.reduceat(weights[part.rows], part.starts)
+        keep = numpy.ones(self.n_rows, dtype=bool)
+        keep[part.rows] = False
+        keep[firsts] = True
+        weights = weights.copy()
+        weights[firsts] = group_weights
+        rows = numpy.flatnonzero(keep)
+        if self.store is not None:
+            self.store.keep(rows)
+            self._codes = list(self.store.codes().values())
+        else:
+            self._codes = [codes[rows] for codes in self._codes]
+        self.weights = weights[rows]
+        self.n_rows = len(rows)
+        self._partitions.clear()
+        self.sample = None
+
+    def total_weight(self):
+        """
+        Returns the number of rows in the data, counting each row as many
+        times as it occurs.
+        """
+        if self.weights is None:
+            return self.n_rows
+        return int(self.weights.sum())
+
+    def to_mask(self, attrs):
+        """
+        Returns the bitmask of the columns named in attrs.
+        """
+        return to_mask(attrs, self.columns)
+
+    def to_attrs(self, mask):
+        """
+        Returns the names of the columns in bitmask mask.
+        """
+        return to_attrs(mask, self.columns)
+
+    def codes(self, attr):
+        """
+        Returns the integer codes of the attr-th column.
+
+        Arguments:
+            attr (int) : position of the column
+
+        Returns:
+            codes (numpy.ndarray) : integer code of each row's value
+        """
+        return self._codes[attr]
+
+    def get(self, attrs):
+        """
+        Returns the stripped partition of attrs, computing it if necessary.
+
+        Arguments:
+            attrs (int) : bitmask of the attributes to partition the rows on
+
+        Returns:
+            partition (StrippedPartition) : stripped partition of attrs
+        """
+        part = self._partitions.get((self._id, attrs))
+        if part is not None:
+            self.hits += 1
+            return part
+        self.misses += 1
+        positions = bits(attrs)
+        if len(positions) == 1:
+            part = StrippedPartition.from_codes(self._codes[positions[0]])
+            cost = self.n_rows
+        else:
+            base = positions[-1]
+            for attr in positions:
+                if (self._id, attrs & ~(1 << attr)) in self._partitions:
+                    base = attr
+                    break
+            subset = self.get(attrs & ~(1 << base))
+            part = subset.refine(self._codes[base])
+            cost = len(subset.rows)
+        nbytes = part.rows.nbytes + part.starts.nbytes + PARTITION_OVERHEAD_BYTES
+        self._partitions.put((self._id, attrs), part, nbytes, cost)
+        return part
+
+    def has_size(self, attrs):
+        """
+        Returns True if the number of equivalence classes for attrs is
+        already known, False otherwise.
+
+        Arguments:
+            attrs (int) : bitmask of the attributes to partition the rows on
+        """
+        return attrs in self._sizes or (self._id, attrs) in self._partitions
+
+    def size(self, attrs):
+        """
+        Returns the number of equivalence classes (including singletons)
+        for the attributes in attrs.
+
+        Arguments:
+            attrs (int) : bitmask of the attributes to partition the rows on
+
+        Returns:
+            size (int) : number of distinct value combinations of attrs
+        """
+        if attrs in self._sizes:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._sizes[attrs] = self.n_rows - self.get(attrs).error()
+        return self._sizes[attrs]
+
+    def sizes(self):
+        """
+        Returns the numbers of equivalence classes computed so far.
+
+        Returns:
+            sizes (dict[int --> int]) : number of equivalence classes of each
+            attribute bitmask
+        """
+        return dict(self._sizes)
+
+    def add_sizes(self, sizes):
+        """
+        Adds numbers of equivalence classes computed before, e.g. by an
+        earlier search over the same data.
+
+        Arguments:
+            sizes (dict[int --> int]) : number of equivalence classes of each
+            attribute bitmask
+        """
+        self._sizes.update(sizes)
+
+
+class SearchStats(object):
+    """
+    Counts what the DFD search did while finding the LHSs of one RHS.
+
+    Attributes:
+        nodes_created (int) : lattice nodes created
+        nodes_visited (int) : lattice nodes visited
+        nodes_inferred (int) : visited nodes whose category was inferred from
+        other nodes instead of being checked on the data
+        partition_checks (int) : calls to compute_partitions
+        sample_refutations (int) : checks refuted on the row sample alone
+        cache_hits (int) : partitions and sizes found in the PartitionCache
+        cache_misses (int) : partitions and sizes that had to be computed
+        approximate_seconds (float) : time spent in approximate_dependencies
+        seed_rounds (int) : rounds of seeds generated by generate_next_seeds
+        seconds (float) : total time of the search
+        complete (bool) : False if the search was stopped at its deadline
+        before finding every LHS
+    """
+
+    def __init__(self):
+        self.nodes_created = 0
+        self.nodes_visited = 0
+        self.nodes_inferred = 0
+        self.partition_checks = 0
+        self.sample_refutations = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.approximate_seconds = 0.0
+        self.seed_rounds = 0
+        self.seconds = 0.0
+        self.complete = True
+
+    def cache_hit_rate(self):
+        """
+        Returns the fraction of PartitionCache lookups that were hits, or
+        None if there were none.
+        """
+        lookups = self.cache_hits + self.cache_misses
+        if lookups == 0:
+            return None
+        return self.cache_hits / lookups
+
+    def to_dict(self):
+        """
+        Returns the counts as a dictionary, including the cache hit rate.
+        """
+        dic = dict(self.__dict__)
+        dic['cache_hit_rate'] = self.cache_hit_rate()
+        return dic
+
+    def __repr__(self):
+        return "SearchStats({})".format(self.to_dict())
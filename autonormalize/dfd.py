@@ -1,185 +1,579 @@
-from functools import partial
-from itertools import combinations
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import numpy
 from tqdm import tqdm
 
-from .classes import DfdDependencies, LHSs, Masks, Node
+from .classes import (
+    DfdDependencies,
+    Lattice,
+    LHSs,
+    PartitionCache,
+    SearchStats,
+    bits
+)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python 3.7, where dfd searches in a single process
+    shared_memory = None
 
 # see https://hpi.de/fileadmin/user_upload/fachgebiete/naumann/publications/2014/DFD_CIKM2014_p949_CRC.pdf for DFD paper
 # run script.py  to see a couple examples
 
+# minimum number of rows in the sample used to refute candidate dependencies
+SAMPLE_ROWS = 1000
 
-def dfd(df, accuracy, index=None):
+# minimum number of seconds between two checkpoint writes
+CHECKPOINT_SECONDS = 60
+
+
+def dfd(df, accuracy, index=None, n_jobs=1, max_lhs_size=None, checkpoint=None, resume_from=None, stats=None,
+        time_budget=None, complete=None):
     """
     Main loop of DFD algorithm. It returns all the dependencies represented
     in the data in dataframe df. Refer to section 3.2 of paper for literature.
     Checks each column to see if it's unique. If it is unique, it is added
     as the LHS of a dependency for every other element. It then loops through
     all the other non-unique columns and determines all the LHS that the
-    column depends on. (LHS --> column)
+    column depends on. (LHS --> column) Duplicate rows are first dropped,
+    with each distinct row weighted by its number of copies. Constant columns
+    and all but one of each group of equivalent columns are left out of the
+    search, and their dependencies are added from the ones found.
 
     Arguments:
 
-        df (pd.Dataframe) : the dataframe containing the data to find the
-        dependencies from
+        df (pd.Dataframe or PartitionCache) : the dataframe containing the
+        data to find the dependencies from, or the data already encoded
 
         accuracy (0 < float <= 1.00) : the accuracy threshold required in order
         to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows
         must hold true the dependency LHS --> RHS)
 
+        index (str, optional) : name of column that is intended index of df
+
+        n_jobs (int, optional) : number of processes to spread the per-RHS
+        searches over, -1 uses all cores (default 1). Needs Python 3.8 or
+        later, earlier versions search in a single process
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        to search for, unbounded if None
+
+        checkpoint (str, optional) : path to write the LHSs of the finished
+        columns and the partition sizes to, at most every CHECKPOINT_SECONDS
+        seconds, so an interrupted search can be resumed
+
+        resume_from (str, optional) : path of a checkpoint of a search over
+        the same data with the same parameters, its finished columns are not
+        searched again. If the file does not exist the search starts from
+        scratch.
+
+        stats (dict, optional) : if given, the SearchStats of each searched
+        column are added to it under the column's name
+
+        time_budget (float, optional) : number of seconds after which the
+        search stops and returns the minimal dependencies confirmed so far.
+        The LHSs of a single column are then looked for first for every
+        column, before the searches for larger LHSs.
+
+        complete (dict, optional) : if given, whether all the LHSs of each
+        column were found is added to it under the column's name
+
     Returns:
 
         minimal_dependencies (DfdDependencies) : the minimal dependencies
         represented by the data in df
     """
-    partitions = {}
-    masks = Masks(df.columns)
-    non_uniq = set(df.columns)
-    unique_attrs = set()
-    dependencies = DfdDependencies(df.columns)
-    for i in non_uniq.copy():
-        if df[i].is_unique or i == index:
-            unique_attrs.add(i)
-            non_uniq.remove(i)
-            dependencies.add_unique_lhs(i)
-    for i in tqdm(non_uniq):
-        lhss = find_LHSs(i, non_uniq, df, partitions, accuracy, masks)
-        dependencies.add_LHSs(i, lhss)
+    deadline = None if time_budget is None else time.time() + time_budget
+    if isinstance(df, PartitionCache):
+        partitions = df
+    else:
+        partitions = PartitionCache.from_df(df)
+    partitions.drop_duplicates()
+    add_sample(partitions, accuracy)
+    columns = partitions.columns
+    dependencies = DfdDependencies(columns)
+    non_uniq = add_unique_lhss(dependencies, partitions, index)
+    search, constants, equivalents = split_equivalent_columns(partitions, non_uniq)
+    fingerprint = None
+    done = {}
+    if checkpoint is not None or resume_from is not None:
+        fingerprint = data_fingerprint(partitions, accuracy, index, max_lhs_size)
+    if resume_from is not None and os.path.exists(resume_from):
+        done = load_checkpoint(resume_from, fingerprint, partitions)
+    rhss = [i for i in bits(search) if i not in done]
+    # LHSs found by searches stopped at the deadline, all confirmed minimal
+    partial = {i: set() for i in rhss}
+    if deadline is not None and max_lhs_size != 1:
+        for i in rhss:
+            partial[i] = find_LHSs(i, search, partitions, accuracy, 1, deadline=deadline).all_sets()
+    collect_stats = stats is not None or deadline is not None
+    last_write = time.time()
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs > 1 and len(rhss) > 1 and shared_memory is not None:
+        results = find_LHSs_parallel(search, partitions, accuracy, n_jobs, max_lhs_size, rhss,
+                                     collect_stats=collect_stats, deadline=deadline)
+    else:
+        results = (_find_LHSs_with_stats(i, search, partitions, accuracy, max_lhs_size, collect_stats, deadline)
+                   for i in tqdm(rhss))
+    for i, lhss, search_stats in results:
+        if stats is not None:
+            stats[columns[i]] = search_stats
+        if search_stats is not None and not search_stats.complete:
+            partial[i] |= lhss.all_sets()
+            continue
+        done[i] = lhss.all_sets()
+        if checkpoint is not None and time.time() - last_write >= CHECKPOINT_SECONDS:
+            save_checkpoint(checkpoint, fingerprint, done, partitions)
+            last_write = time.time()
+    for i in bits(search):
+        lhss = LHSs(search & ~(1 << i))
+        for lhs in done.get(i, partial.get(i)):
+            lhss.add_dep(lhs)
+        dependencies.add_LHSs(columns[i], lhss)
+    add_equivalent_lhss(dependencies, partitions, accuracy, search, constants, equivalents)
+    if complete is not None:
+        for i, col in enumerate(columns):
+            rep = next((rep for rep, others in equivalents.items() if others >> i & 1), i)
+            complete[col] = rep in done or not search >> rep & 1
     return dependencies
 
 
-def find_LHSs(rhs, attrs, df, partitions, accuracy, masks):
+def _find_LHSs_with_stats(rhs, attrs, partitions, accuracy, max_lhs_size, collect_stats, deadline=None):
+    search_stats = SearchStats() if collect_stats else None
+    lhss = find_LHSs(rhs, attrs, partitions, accuracy, max_lhs_size, stats=search_stats, deadline=deadline)
+    return rhs, lhss, search_stats
+
+
+def data_fingerprint(partitions, accuracy, index, max_lhs_size):
+    """
+    Returns a hash of the encoded data and the search parameters, used to
+    check a checkpoint belongs to the same search.
+    """
+    digest = hashlib.sha256(repr((partitions.columns, partitions.n_rows, accuracy, index, max_lhs_size)).encode())
+    for i in range(len(partitions.columns)):
+        digest.update(numpy.ascontiguousarray(partitions.codes(i)).data)
+    if partitions.weights is not None:
+        digest.update(numpy.ascontiguousarray(partitions.weights).data)
+    return digest.hexdigest()
+
+
+def save_checkpoint(path, fingerprint, done, partitions):
+    """
+    Writes the LHSs of the finished columns and the partition sizes computed
+    so far to path. The file is replaced atomically, so an interrupted write
+    leaves the previous checkpoint in place.
+
+    Arguments:
+        path (str) : path of the checkpoint
+
+        fingerprint (str) : fingerprint of the data and search parameters
+
+        done (dict[int --> set[int]]) : LHSs of each finished RHS
+
+        partitions (PartitionCache) : the cache whose sizes are saved
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'done': done, 'sizes': partitions.sizes()},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, fingerprint, partitions):
+    """
+    Reads a checkpoint written by save_checkpoint and adds its partition
+    sizes to partitions.
+
+    Arguments:
+        path (str) : path of the checkpoint
+
+        fingerprint (str) : fingerprint of the data and search parameters
+
+        partitions (PartitionCache) : the cache to add the sizes to
+
+    Returns:
+        done (dict[int --> set[int]]) : LHSs of each finished RHS
+    """
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    if state['fingerprint'] != fingerprint:
+        raise ValueError('The checkpoint at {} is of a search over different data or with different parameters'.format(path))
+    partitions.add_sizes(state['sizes'])
+    return state['done']
+
+
+def add_unique_lhss(dependencies, partitions, index=None):
+    """
+    Adds every unique column, and the index, as a LHS of every other column.
+    Unique columns are not searched as part of any other LHS. No column is
+    unique if rows were dropped as duplicates of others.
+
+    Arguments:
+        dependencies (DfdDependencies) : dependencies to add the LHSs to
+
+        partitions (PartitionCache) : encoded columns of the data
+
+        index (str, optional) : name of column that is intended index
+
+    Returns:
+        non_uniq (int) : bitmask of the columns that are not unique
+    """
+    non_uniq = 0
+    duplicates = partitions.weights is not None and partitions.weights.max() > 1
+    for i, col in enumerate(partitions.columns):
+        if (not duplicates and partitions.get(1 << i).num_classes() == 0) or col == index:
+            dependencies.add_unique_lhs(col)
+        else:
+            non_uniq |= 1 << i
+    return non_uniq
+
+
+def split_equivalent_columns(partitions, attrs):
+    """
+    Finds the constant columns and the groups of equivalent columns in attrs,
+    columns whose values map one to one to each other. Equivalent columns
+    have the same partition, alone or with any other columns, so only one
+    column of each group needs to be searched. Columns are equivalent when
+    their codes are equal after renumbering the values in order of first
+    occurrence, which is only computed for columns with the same number of
+    values.
+
+    Arguments:
+        partitions (PartitionCache) : encoded columns of the data
+
+        attrs (int) : bitmask of the columns to look in
+
+    Returns:
+        search (int) : bitmask of the columns to search, the first column
+        of each group of equivalent columns
+
+        constants (int) : bitmask of the constant columns
+
+        equivalents (dict[int --> int]) : bitmask of the other columns of
+        the group of each searched column with equivalent columns
+    """
+    constants = 0
+    by_size = {}
+    for attr in bits(attrs):
+        size = partitions.size(1 << attr)
+        if size == 1:
+            constants |= 1 << attr
+        else:
+            by_size.setdefault(size, []).append(attr)
+    search = attrs & ~constants
+    equivalents = {}
+    for same_size in by_size.values():
+        if len(same_size) == 1:
+            continue
+        groups = {}
+        for attr in same_size:
+            renumbered = renumber(partitions.codes(attr))
+            key = hashlib.sha256(renumbered).digest()
+            rep = groups.get(key)
+            if rep is not None and numpy.array_equal(renumber(partitions.codes(rep)), renumbered):
+                equivalents[rep] = equivalents.get(rep, 0) | 1 << attr
+                search &= ~(1 << attr)
+            else:
+                groups[key] = attr
+    return search, constants, equivalents
+
+
+def renumber(codes):
+    """
+    Returns codes with the values numbered in order of first occurrence.
+    Two columns are equivalent exactly when their renumbered codes are equal.
+    """
+    _, first, inverse = numpy.unique(codes, return_index=True, return_inverse=True)
+    order = numpy.empty(len(first), dtype=numpy.int64)
+    order[numpy.argsort(first)] = numpy.arange(len(first))
+    return order[inverse]
+
+
+def add_equivalent_lhss(dependencies, partitions, accuracy, search, constants, equivalents):
+    """
+    Adds the dependencies of the columns left out of the search by
+    split_equivalent_columns. Every other column is a LHS of a constant
+    column, and the constant columns are LHSs of a searched column if one of
+    them is. A LHS containing a searched column is also a LHS with it
+    replaced by an equivalent column, every column of a group has the LHSs
+    of the searched column, and each column of a group is a LHS of the
+    others.
+
+    Arguments:
+        dependencies (DfdDependencies) : dependencies found for the searched
+        columns, to add to
+
+        partitions (PartitionCache) : encoded columns of the data
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency
+
+        search (int) : bitmask of the searched columns
+
+        constants (int) : bitmask of the constant columns
+
+        equivalents (dict[int --> int]) : bitmask of the other columns of
+        the group of each searched column with equivalent columns
+    """
+    columns = partitions.columns
+    if constants:
+        lhss = LHSs(constants)
+        for attr in bits(constants):
+            lhss.add_dep(1 << attr)
+            dependencies.add_constant(columns[attr])
+        for rhs in bits(search):
+            if compute_partitions(rhs, constants & -constants, partitions, accuracy):
+                dependencies.add_LHSs(columns[rhs], lhss)
+    dependencies.add_equivalents({columns[rep]: partitions.to_attrs(others) for rep, others in equivalents.items()})
+
+
+def find_LHSs_parallel(attrs, partitions, accuracy, n_jobs, max_lhs_size=None, rhss=None, collect_stats=False,
+                       deadline=None):
+    """
+    Runs find_LHSs for every attribute in attrs over a pool of n_jobs
+    processes, yielding the results as they finish. The encoded columns are placed in shared memory once, so
+    workers attach to them instead of receiving a pickled copy of the data. The memory bound of the
+    partitions, if any, is split between the workers.
+
+    Arguments:
+        attrs (int) : bitmask of the non-unique columns to find LHSs for
+
+        partitions (PartitionCache) : encoded columns of the data
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency
+
+        n_jobs (int) : number of worker processes
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+
+        rhss (list[int], optional) : positions of the columns to find LHSs
+        for, every column in attrs if None
+
+        collect_stats (bool, optional) : whether to count what each search did
+
+        deadline (float, optional) : time.time() at which the searches stop
+
+    Yields:
+        result ((int, LHSs, SearchStats)) : a rhs, all the LHS that determine
+        it and the stats of its search, None if collect_stats is False
+    """
+    columns = partitions.columns
+    shape = (len(columns), partitions.n_rows)
+    dtype = numpy.result_type(*[partitions.codes(i).dtype for i in range(len(columns))])
+    shm = shared_memory.SharedMemory(create=True, size=max(shape[0] * shape[1] * dtype.itemsize, 1))
+    try:
+        codes = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        for i in range(len(columns)):
+            codes[i] = partitions.codes(i)
+        del codes
+        if rhss is None:
+            rhss = bits(attrs)
+        max_bytes = partitions.max_bytes()
+        if max_bytes is not None:
+            max_bytes //= n_jobs
+        init_args = (shm.name, shape, dtype, columns,
+                     partitions.weights, max_bytes, accuracy)
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(_find_LHSs_worker, rhs, attrs, accuracy, max_lhs_size, collect_stats, deadline)
+                       for rhs in rhss]
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                rhs, lhs_sets, search_stats = future.result()
+                lhss = LHSs(attrs & ~(1 << rhs))
+                for lhs in lhs_sets:
+                    lhss.add_dep(lhs)
+                yield rhs, lhss, search_stats
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+_worker_state = {}
+
+
+def _init_worker(shm_name, shape, dtype, columns, weights, max_bytes, accuracy):
+    """
+    Attaches a worker process to the shared encoded columns.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    codes = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker_state['shm'] = shm
+    _worker_state['partitions'] = PartitionCache(dict(zip(columns, codes)), weights)
+    _worker_state['partitions'].set_max_bytes(max_bytes)
+    add_sample(_worker_state['partitions'], accuracy)
+
+
+def add_sample(partitions, accuracy, size=None):
+    """
+    Attaches a cache over a fixed random sample of the rows to partitions,
+    which compute_partitions uses to refute candidate dependencies before
+    checking them on all rows. Small tables are not sampled.
+
+    A dependency that is violated on the sample is violated on all rows: an
+    exact dependency fails on any two sampled rows that break it, and the g3
+    error of the sample is never more than the g3 error of all the rows.
+    For approximate dependencies the sample therefore has to be large
+    enough for its error to exceed the limit for all the rows.
+
+    Arguments:
+        partitions (PartitionCache) : cache to attach the sample to
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency
+
+        size (int, optional) : number of rows to sample, chosen from the number
+        of rows and accuracy if not given
+    """
+    n_rows = partitions.n_rows
+    if size is None:
+        size = max(SAMPLE_ROWS, int(5 * n_rows * (1 - accuracy)))
+    if size * 2 > n_rows:
+        return
+    rows = numpy.sort(numpy.random.RandomState(0).choice(n_rows, size, replace=False))
+    partitions.sample = partitions.take(rows)
+
+
+def _find_LHSs_worker(rhs, attrs, accuracy, max_lhs_size, collect_stats, deadline):
+    rhs, lhss, search_stats = _find_LHSs_with_stats(rhs, attrs, _worker_state['partitions'], accuracy,
+                                                    max_lhs_size, collect_stats, deadline)
+    return rhs, lhss.all_sets(), search_stats
+
+
+def find_LHSs(rhs, attrs, partitions, accuracy, max_lhs_size=None, max_non_deps=None, stats=None, deadline=None):
     """
     Finds all LHS sets of attributes that satisfy a dependency relation for the
     RHS attribute i. This is such that LHS --> RHS.
 
     Arguments:
 
-        rhs (str) : name of column for which we are investigating dependencies
-        for attrs (Set object containing strings): the columns to consider as
-        LHS attributes
+        rhs (int) : position of column for which we are investigating dependencies
 
-        df (Dataframe) : dataframe containing data to look at
+        attrs (int) : bitmask of the columns to consider as LHS attributes
 
-        partitions (dict[frozenset[str] --> int]) : dictionary containing past
-        calculated partition sizes for column combinations
+        partitions (PartitionCache) : encoded columns of the data and past
+        calculated stripped partitions for column combinations
 
         accuracy (0 < float <= 1.00) : the accuracy threshold required in order
         to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows must
         hold true the dependency LHS --> RHS)
 
-        masks (Masks) : contains past calculated masks
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        to search for, unbounded if None
+
+        max_non_deps (LHSs, optional) : if given, the maximal non-dependencies
+        found by the search are added to it
+
+        stats (SearchStats, optional) : if given, counts what the search did
+
+        deadline (float, optional) : time.time() at which to stop the search
+        and return the minimal LHSs found so far, marking stats as not
+        complete
 
     Returns:
         lhss (LHSs) : all the LHS that determine rhs
     """
-    lhs_attrs = attrs.difference(set([rhs]))
-    seeds = nodes_from_seeds(sorted(list(lhs_attrs)))
+    if stats is not None:
+        start = time.time()
+        hits, misses = partitions.hits, partitions.misses
+    lhs_attrs = attrs & ~(1 << rhs)
+    lattice = Lattice(lhs_attrs, max_lhs_size)
+    seeds = nodes_from_seeds(lattice, [1 << attr for attr in bits(lhs_attrs)])
     min_deps = LHSs(lhs_attrs)
-    max_non_deps = LHSs(lhs_attrs)
+    if max_non_deps is None:
+        max_non_deps = LHSs(lhs_attrs)
     trace = []
+    stopped = False
     while seeds != []:
-        node = seeds[0]  # should this actually be random?
-        while node is not None:
-
-            if node.visited:
-                if node.is_candidate():
-                    if node.is_dependency():
-                        if node.is_minimal():
-                            min_deps.add_dep(node.attrs)
-                    else:
-                        if node.is_maximal():
-                            max_non_deps.add_dep(node.attrs)
-                    node.update_dependency_type(min_deps, max_non_deps)
-
-            else:
-                node.infer_type()
-                if node.category == 0:
-                    if compute_partitions(df, rhs, node.attrs, partitions, accuracy, masks):
-                        if node.is_minimal():
-                            min_deps.add_dep(node.attrs)
-                            node.category = 2
-                        else:
-                            node.category = 3
-                    else:
-                        if node.is_maximal():
-                            max_non_deps.add_dep(node.attrs)
-                            node.category = -2
+        for node in seeds:
+            if node.visited and not node.is_candidate():
+                continue
+            while node is not None:
+                if deadline is not None and time.time() >= deadline:
+                    stopped = True
+                    break
+
+                if node.visited:
+                    if node.is_candidate():
+                        if node.is_dependency():
+                            if node.is_minimal():
+                                min_deps.add_dep(node.attrs)
                         else:
-                            node.category = -3
-                node.visited = True
+                            if node.is_maximal():
+                                max_non_deps.add_dep(node.attrs)
+                        node.update_dependency_type(min_deps, max_non_deps)
 
-            node = pick_next_node(node, trace, min_deps, max_non_deps, df.columns)
-
-        seeds = nodes_from_seeds(sorted(generate_next_seeds(max_non_deps, min_deps, lhs_attrs)))
+                else:
+                    node.infer_type()
+                    if stats is not None:
+                        stats.nodes_visited += 1
+                        if node.category != 0:
+                            stats.nodes_inferred += 1
+                    if node.category == 0:
+                        if compute_partitions(rhs, node.attrs, partitions, accuracy, stats):
+                            if node.is_minimal():
+                                min_deps.add_dep(node.attrs)
+                                node.category = 2
+                            else:
+                                node.category = 3
+                        else:
+                            if node.is_maximal():
+                                max_non_deps.add_dep(node.attrs)
+                                node.category = -2
+                            else:
+                                node.category = -3
+                    node.visited = True
+
+                node = pick_next_node(node, trace, min_deps, max_non_deps)
+            if stopped:
+                break
+
+        if stopped:
+            if stats is not None:
+                stats.complete = False
+            break
+        seeds = nodes_from_seeds(lattice, generate_next_seeds(max_non_deps, min_deps, lhs_attrs, max_lhs_size))
+        if stats is not None:
+            stats.seed_rounds += 1
+    if stats is not None:
+        stats.nodes_created = len(lattice.nodes())
+        stats.cache_hits = partitions.hits - hits
+        stats.cache_misses = partitions.misses - misses
+        stats.seconds = time.time() - start
     return min_deps
 
 
-def nodes_from_seeds(seeds):
+def nodes_from_seeds(lattice, seeds):
     """
-    Returns nodes from a list of seeds. Creates nodes for each seed,
-    and calls make_lattice which connexts them forming the rest of the
-    lattice graph.
+    Returns the nodes of lattice for a list of seeds that still need to be
+    visited, in the order they should be visited. The rest of the lattice graph is created on
+    demand as the search moves through it.
 
     Arguments:
-        seeds (set[str]) : set of column names of seeds
+        lattice (Lattice) : lattice graph being searched
+        seeds (list[int]) : bitmasks of the attributes of each seed
 
     Returns:
-        nodes (list[Node]) : list of base nodes for lattice graph
+        nodes (list[Node]) : list of base nodes to start the search from
     """
-    base_nodes = [Node(frozenset([attr])) for attr in seeds]
-    make_lattice(base_nodes, seeds)
-    return base_nodes
+    nodes = [lattice.node(seed) for seed in seeds]
+    return sorted([n for n in nodes if not n.visited or n.is_candidate()], key=sort_key)
 
 
-def make_lattice(nodes, attrs):
+def sort_key(node):
     """
-    Builds the rest of the lattice graph given a list of nodes,
-    creating nodes for all possible subsets of the nodes given,
-    and connecting them to each other.
-
-    Arguments:
-        nodes (list[Node]) : list of nodes to connect upward from
-        attrs (set[str]): set of column names present in the lattice
+    Sort key for sorting lists of nodes. Bitmasks compare like the attribute
+    positions they encode, so nodes made of earlier columns sort first.
     """
-    if len(nodes) < 2:
-        return
-    # TO DO: inefficient, but straight forward --> OPTIMIZE THIS
-    this_level_size = len(nodes[0].attrs)
-    next_level = []
-    combos = combinations(attrs, this_level_size + 1)
-    for new_attrs in combos:
-        new_node = Node(frozenset(new_attrs))
-        for n in nodes:
-            if n.attrs.issubset(new_attrs):
-                new_node.add_prev(n)
-                n.add_next(new_node)
-        next_level.append(new_node)
-    make_lattice(next_level, attrs)
-    # for i in range(len(nodes)-1):
-    #     for j in range(i+1, len(nodes)):
-    #         new_attrs = (nodes[i].attrs).union(nodes[j].attrs)
-    #         prev = [nodes[i], nodes[j]]
-    #         for n in nodes[j+1:]:
-    #             if n.attrs.issubset(new_attrs):
-    #                 prev.append(n)
-    #         new_node = Node(new_attrs, prev, [])
-    #         next_level.append(new_node)\
-
-
-def sort_key(attrs, node):
-    """
-    Sort key for sorting lists of nodes.
-    """
-    acc = 0
-    for i in range(len(attrs)):
-        if attrs[i] in node.attrs:
-            acc += 10**i
-    return acc
-
-
-def pick_next_node(node, trace, min_deps, max_non_deps, attrs):
+    return node.attrs
+
+
+def pick_next_node(node, trace, min_deps, max_non_deps):
     """
     Picks the next node to look at. If current node is a candidate minimum
     dependency looks for unchecked subsets. If no unchecked subsets that could
@@ -200,16 +594,15 @@ def pick_next_node(node, trace, min_deps, max_non_deps, attrs):
         next_node (Node or None) : next node to look at, None if none left
         to check in currrent part of graph
     """
-    srt_key = partial(sort_key, sorted(attrs))
     if node.category == 3:
         s = node.unchecked_subsets()
         remove_pruned_subsets(s, min_deps)
         if s == []:
             min_deps.add_dep(node.attrs)
-            node.cateogry = 2
+            node.category = 2
         else:
             trace.append(node)
-            return sorted(s, key=srt_key)[0]
+            return min(s, key=sort_key)
     elif node.category == -3:
         s = node.unchecked_supersets()
         remove_pruned_supersets(s, max_non_deps)
@@ -218,11 +611,10 @@ def pick_next_node(node, trace, min_deps, max_non_deps, attrs):
             node.category = -2
         else:
             trace.append(node)
-            return sorted(s, key=srt_key)[0]
-    else:
-        if trace == []:
-            return None
-        return trace.pop()
+            return min(s, key=sort_key)
+    if trace == []:
+        return None
+    return trace.pop()
 
 
 def remove_pruned_subsets(subsets, min_deps):
@@ -255,129 +647,137 @@ def remove_pruned_supersets(supersets, max_non_deps):
             supersets.remove(n)
 
 
-def generate_next_seeds(max_non_deps, min_deps, lhs_attrs):
+def generate_next_seeds(max_non_deps, min_deps, lhs_attrs, max_lhs_size=None):
     """
-    Generates seeds for the nodes that are still unchecked due to pruning.
-    This is done based off of the knowledge that once every possibility has
-    been considered, the compliment of hte maximal non-dependencies, minus
-    the existing minimum dependencies is 0 (the two are equal). Thus, if this
-    is not satisfied, the new seeds are the remaining elements.
+    Generates seeds for the nodes that are still unchecked due to pruning
+    (see section 3.3 of the DFD paper). An attribute set is still
+    unclassified if it is not a subset of any maximal non-dependency and not
+    a superset of any minimal dependency. Every such set contains a minimal
+    set hitting the compliment of each maximal non-dependency, so the seeds
+    are those minimal hitting sets, minus the ones that are supersets of a
+    discovered minimal dependency. Once every possibility has been
+    considered there are none left.
 
     Arguments:
         max_non_deps (LHSs) : discovered maximal non-dependencies
         min_deps (LHSs) : discovered minimal dependencies
-        lhs_attrs (set[str]) : attributes being considered as parts of LHSs
+        lhs_attrs (int) : bitmask of attributes being considered as parts of LHSs
+        max_lhs_size (int, optional) : largest number of attributes in a seed
 
     Returns:
-        seed_attributes (list[str]) : list of seeds that need to be visited
+        seeds (list[int]) : bitmasks of the seeds that need to be visited
     """
-    seeds = set()
-    if max_non_deps.all_sets() == set():
-        seeds = lhs_attrs.difference(min_deps.all_sets().pop())
+    non_deps = max_non_deps.all_sets()
+    if len(non_deps) == 0:
+        seeds = [1 << attr for attr in bits(lhs_attrs)]
     else:
-        for nfd in max_non_deps.all_sets():
-            nfd_compliment = lhs_attrs.difference(nfd)
-            if len(seeds) == 0:
-                seeds = nfd_compliment
-            else:
-                seeds = seeds.intersection(nfd_compliment)
-    for x in min_deps.all_sets():
-        seeds = seeds.difference(x)
-    return list(seeds)
-
-
-def compute_partitions(df, rhs, lhs_set, partitions, accuracy, masks):
+        seeds = [0]
+        for nfd in non_deps:
+            compliment = lhs_attrs & ~nfd
+            # seeds already hitting compliment stay minimal; a seed extended
+            # by attr can only be a superset of a kept seed containing attr
+            kept = {}
+            next_seeds = set()
+            for seed in seeds:
+                if seed & compliment:
+                    next_seeds.add(seed)
+                    for attr in bits(seed & compliment):
+                        kept.setdefault(attr, []).append(seed)
+            for seed in seeds:
+                if seed & compliment:
+                    continue
+                for attr in bits(compliment):
+                    new_seed = seed | (1 << attr)
+                    if max_lhs_size is not None and bin(new_seed).count('1') > max_lhs_size:
+                        continue
+                    if any(y & new_seed == y for y in kept.get(attr, [])):
+                        continue
+                    if not min_deps.contains_subset(new_seed):
+                        next_seeds.add(new_seed)
+            seeds = list(next_seeds)
+    return [x for x in seeds if not min_deps.contains_subset(x)]
+
+
+def compute_partitions(rhs, lhs_set, partitions, accuracy, stats=None):
     """
-    Returns true if lhs_set --> rhs for dataframe df.
+    Returns true if lhs_set --> rhs for the data in partitions.
 
     Arguments:
 
-        df (pd.DataFrame) : dataframe containing data to look at
-
-        rhs (str) : name of column for which we are investigating dependencies for
-        attrs (Set object containing strings): the columns to consider as LHS attributes
+        rhs (int) : position of column for which we are investigating dependencies for
 
-        lhs_set (set[str]) : set containing column names of LHS set
+        lhs_set (int) : bitmask of the columns in the LHS set
 
-        partitions (dict[frozenset[str] --> int]) : dictionary containing past
-        calculated partition sizes for column combinations
+        partitions (PartitionCache) : encoded columns of the data and past
+        calculated stripped partitions for column combinations
 
         accuracy (0 < float <= 1.00) : the accuracy threshold required in order
         to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows must
         hold true the dependency LHS --> RHS)
 
-        masks (Masks) : contains past calculated masks
+        stats (SearchStats, optional) : if given, counts the check
 
     Returns:
         is_dependency (bool) : True if is a dependency, false otherwise
     """
+    if stats is not None:
+        stats.partition_checks += 1
+    if partitions.sample is not None and refuted_by_sample(rhs, lhs_set, partitions, accuracy):
+        if stats is not None:
+            stats.sample_refutations += 1
+        return False
     # for approximate dependencies see TANE section 2.3s
     if accuracy < 1:
-        return approximate_dependencies(list(lhs_set), rhs, df, accuracy, masks)
-    part_rhs = partition(lhs_set.union(set([rhs])), df, partitions)
+        if stats is None:
+            return approximate_dependencies(lhs_set, rhs, partitions, accuracy)
+        start = time.time()
+        result = approximate_dependencies(lhs_set, rhs, partitions, accuracy)
+        stats.approximate_seconds += time.time() - start
+        return result
+    part_rhs = partition(lhs_set | (1 << rhs), partitions)
     # if part_rhs > df.shape[0] * rep_percent:
     #     return False
-    return part_rhs == partition(lhs_set, df, partitions)
+    return part_rhs == partition(lhs_set, partitions)
+
+
+def refuted_by_sample(rhs, lhs_set, partitions, accuracy):
+    """
+    Returns True if the rows in partitions.sample show that lhs_set --> rhs
+    does not hold for all the rows in partitions. Returns False if the
+    sample is not enough to tell.
+    """
+    sample = partitions.sample
+    if accuracy < 1:
+        limit = partitions.total_weight() * (1 - accuracy)
+        return sample.get(lhs_set).g3_error(sample.codes(rhs), sample.weights) > limit
+    return partition(lhs_set | (1 << rhs), sample) != partition(lhs_set, sample)
 
 
-def partition(attrs, df, partitions):
+def partition(attrs, partitions):
     """
     Returns the number of equivilence classes for the columns represented
-    in attrs for dataframe df.
+    in the bitmask attrs. The classes are found from the stripped partitions
+    in partitions rather than from the raw dataframe.
     """
-    if attrs in partitions:
-        return partitions[attrs]
-    shape = df.drop_duplicates(attrs).shape[0]
-    partitions[attrs] = shape
-    return shape
+    return partitions.size(attrs)
 
 
-def approximate_dependencies(lhs_set, rhs, df, accuracy, masks):
+def approximate_dependencies(lhs_set, rhs, partitions, accuracy):
     """
     Checks whether the columns represented in lhs_set functionally determines the column rhs
-    for the dataframe df.
+    for the data in partitions.
     If lhs_set --> rhs, returns True. Otherwise returns False.
 
     *in order to be a dependency:
         - the number of equivalence classes for tuples in columns in lhs_set, is equal to the number of equivalence
         classes for tuples in columns in lhs_set+rhs
-        - this holds in data for at least accuracy % of rows
+        - this holds in data for at least accuracy % of rows (the g3 error of
+        lhs_set --> rhs, see TANE section 2.3, is at most 1 - accuracy)
         - at least 15% of values are repeating (*to be added as custom argument*)
     """
-    df_lhs_rhs = df.drop_duplicates(lhs_set + [rhs])
-    df_lhs = df_lhs_rhs.drop_duplicates(lhs_set)
-    # if df_lhs.shape[0] > df.shape[0] * rep_percent:
-    #     return False
-
-    limit = df.shape[0] * (1 - accuracy)
-    if df_lhs_rhs.shape[0] - df_lhs.shape[0] > limit:
+    limit = partitions.total_weight() * (1 - accuracy)
+    lhs_rhs = lhs_set | (1 << rhs)
+    # every extra equivalence class rhs adds needs at least one row removed
+    if partitions.has_size(lhs_rhs) and partition(lhs_rhs, partitions) - partition(lhs_set, partitions) > limit:
         return False
-
-    merged = df_lhs.merge(df_lhs_rhs, indicator=True, how='outer')  # create new df that is the merge of df_one and df_two
-    indicator = merged[merged['_merge'] == 'right_only']  # filter out the rows that were only on the right side (the rows that are preventing the two dataframes from being equal)
-    indicator = indicator.drop_duplicates(lhs_set)  # find unique combinations of columns in LHS_set that characterize the disrepencies (have 2+ different values in rhs column)
-    acc = 0
-
-    for index, row in indicator.iterrows():
-
-        mask = None
-        for attr in lhs_set:
-
-            m = masks.get_mask(attr, row[attr])
-            if m is None:
-                if df[attr].dtypes.name == 'datetime64[ns]':
-                    m = df[attr] == row[attr]
-                else:
-                    m = df[attr].values == row[attr]
-                masks.add_mask(attr, row[attr], m)
-            if mask is None:
-                mask = m
-            else:
-                mask = mask & m
-        options = df[mask]
-        _, unique_counts = numpy.unique(options[rhs].to_numpy(), return_counts=True)
-        acc += unique_counts.sum() - unique_counts.max()
-        if acc > limit:
-            return False
-    # idea: try using numpy arrays and taking intersections of sets for each column????
-    return True
+    return partitions.get(lhs_set).g3_error(partitions.codes(rhs), partitions.weights) <= limit
@@ -0,0 +1,127 @@
+"""
+Times find_dependencies, normalize_dataframe and make_entityset on tables with
+planted dependencies from example_data_gen.generate_planted, and records the
+peak memory of each step.
+
+    python -m autonormalize.examples.benchmark --output results.json
+    python -m autonormalize.examples.benchmark --compare old.json results.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy
+import pandas as pd
+
+import autonormalize as an
+from autonormalize.examples.example_data_gen import generate_planted
+
+ROWS = [10000, 50000]
+COLS = [8, 12]
+CARDINALITY = [10, 1000]
+NOISE = [0.0, 0.01]
+
+
+def measure(func, repeat):
+    """
+    Runs func repeat times and once more with tracemalloc on. Returns the
+    result of func, the fastest time and the peak memory in bytes.
+    """
+    if repeat < 1:
+        raise ValueError('repeat must be at least 1')
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, min(seconds), peak
+
+
+def run_case(rows, cols, cardinality, noise, accuracy=0.98, repeat=1):
+    """
+    Benchmarks the three steps of normalization on one generated table.
+
+    Returns:
+        result (dict) : the parameters of the table and the seconds and peak
+        bytes of each step
+    """
+    df = generate_planted(rows, cols, cardinality, noise)
+    result = {'rows': rows, 'cols': cols, 'cardinality': cardinality, 'noise': noise, 'accuracy': accuracy}
+    deps, result['find_dependencies_seconds'], result['find_dependencies_peak_bytes'] = measure(
+        lambda: an.find_dependencies(df, accuracy), repeat)
+    _, result['normalize_dataframe_seconds'], result['normalize_dataframe_peak_bytes'] = measure(
+        lambda: an.normalize_dataframe(df, deps), repeat)
+    _, result['make_entityset_seconds'], result['make_entityset_peak_bytes'] = measure(
+        lambda: an.make_entityset(df, deps), repeat)
+    return result
+
+
+def run(rows=ROWS, cols=COLS, cardinality=CARDINALITY, noise=NOISE, accuracy=0.98, repeat=1):
+    """
+    Benchmarks every combination of the given parameters.
+
+    Returns:
+        results (dict) : versions of the environment and the result of each case
+    """
+    cases = [run_case(*case, accuracy=accuracy, repeat=repeat)
+             for case in itertools.product(rows, cols, cardinality, noise)]
+    return {
+        'autonormalize': an.__version__,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': numpy.__version__,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'cases': cases,
+    }
+
+
+def compare(old, new):
+    """
+    Returns a table of the ratio new / old of the time and peak memory of
+    each step, for the cases that are in both results.
+    """
+    params = ['rows', 'cols', 'cardinality', 'noise', 'accuracy']
+    old_df = pd.DataFrame(old['cases']).set_index(params)
+    new_df = pd.DataFrame(new['cases']).set_index(params)
+    both = old_df.index.intersection(new_df.index)
+    return new_df.loc[both] / old_df.loc[both]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='file to save the results to as json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved results')
+    parser.add_argument('--rows', type=int, nargs='+', default=ROWS)
+    parser.add_argument('--cols', type=int, nargs='+', default=COLS)
+    parser.add_argument('--cardinality', type=int, nargs='+', default=CARDINALITY)
+    parser.add_argument('--noise', type=float, nargs='+', default=NOISE)
+    parser.add_argument('--accuracy', type=float, default=0.98)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        print(compare(old, new).to_string())
+        return
+
+    results = run(args.rows, args.cols, args.cardinality, args.noise, args.accuracy, args.repeat)
+    print(pd.DataFrame(results['cases']).to_string())
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
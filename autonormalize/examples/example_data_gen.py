@@ -1,6 +1,9 @@
 import csv
 import random
 
+import numpy
+import pandas as pd
+
 
 def generate_example_3():
     csvData = [['A', 'B', 'C', 'D', 'E', 'F', 'G']]
@@ -19,3 +22,60 @@ def generate_example_3():
         writer.writerows(csvData)
 
     csvFile.close()
+
+
+def generate_planted(rows=10000, cols=8, cardinality=100, noise=0.0, seed=0):
+    """
+    Generates a table with planted dependencies, for benchmarks and tests.
+
+    The table has these columns, followed by random columns up to cols
+    columns in total:
+        id : unique key of each row
+        order_id, line : together also a key of each row
+        order_date : depends on order_id only, a partial dependency on the
+        (order_id, line) key
+        customer_id : depends on order_id
+        customer_city : depends on customer_id, so transitively on id
+        region : depends on customer_city
+        segment : depends on customer_id except in a noise fraction of rows,
+        an approximate dependency
+
+    Arguments:
+        rows (int) : number of rows
+        cols (int) : number of columns, at least 8
+        cardinality (int) : number of distinct customers and the number of
+        distinct values of the random columns
+        noise (float) : fraction of rows in which segment breaks its
+        dependency on customer_id
+        seed (int) : seed of the random generator
+
+    Returns:
+        df (pd.DataFrame) : the generated table
+    """
+    if cols < 8:
+        raise ValueError('cols must be at least 8')
+    rng = numpy.random.RandomState(seed)
+    lines = 5
+    order_id = numpy.arange(rows) // lines
+    n_orders = order_id[-1] + 1 if rows > 0 else 0
+    order_customer = rng.randint(0, cardinality, n_orders)
+    customer_id = order_customer[order_id]
+    n_cities = max(cardinality // 10, 2)
+    customer_city = rng.randint(0, n_cities, cardinality)[customer_id]
+    region = rng.randint(0, max(n_cities // 5, 2), n_cities)[customer_city]
+    segment = rng.randint(0, 4, cardinality)[customer_id]
+    noisy = rng.rand(rows) < noise
+    segment[noisy] = (segment[noisy] + rng.randint(1, 4, noisy.sum())) % 4
+    data = {
+        'id': numpy.arange(rows),
+        'order_id': order_id,
+        'line': numpy.arange(rows) % lines,
+        'order_date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.randint(0, 1000, n_orders)[order_id], unit='D'),
+        'customer_id': customer_id,
+        'customer_city': customer_city,
+        'region': region,
+        'segment': segment,
+    }
+    for i in range(cols - 8):
+        data['random_{}'.format(i)] = rng.randint(0, cardinality, rows)
+    return pd.DataFrame(data)
@@ -0,0 +1,289 @@
+import numpy
+
+from . import dfd
+from .classes import DfdDependencies, LHSs, PartitionCache, bits
+
+# see https://hpi.de/fileadmin/user_upload/fachgebiete/naumann/publications/2016/HyFD_SIGMOD2016.pdf
+# for comparing rows close to each other in the classes of each column
+
+# number of following rows each row is compared with in each column's classes
+WINDOW = 2
+
+# number of row pairs compared at a time
+PAIR_BATCH = 100000
+
+
+def fdep(df, accuracy, index=None, max_lhs_size=None):
+    """
+    Finds all the minimal dependencies in the data from the agree sets of
+    pairs of rows, the sets of columns on which two rows have equal values.
+    Two rows that agree on X but not on A show X --> A does not hold, so the
+    LHSs of A are among the minimal sets hitting the complement of every
+    such agree set. Rather than comparing all pairs of rows, each row is
+    compared to the rows following it in its classes of every column's
+    partition. The candidate LHSs this gives are then checked on the data,
+    and the rows violating a candidate give further agree sets, until every
+    candidate holds. The cost grows with the number of rows instead of with
+    the number of column combinations, which suits wide tables with few rows.
+
+    With accuracy < 1 a pair of rows does not refute a dependency, so the
+    candidates start from the single columns and only the candidates that
+    do not hold are used to prune.
+
+    Arguments:
+
+        df (pd.Dataframe or PartitionCache) : the dataframe containing the
+        data to find the dependencies from, or the data already encoded
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows
+        must hold true the dependency LHS --> RHS)
+
+        index (str, optional) : name of column that is intended index of df
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        to search for, unbounded if None
+
+    Returns:
+
+        minimal_dependencies (DfdDependencies) : the minimal dependencies
+        represented by the data in df
+    """
+    if isinstance(df, PartitionCache):
+        partitions = df
+    else:
+        partitions = PartitionCache.from_df(df)
+    partitions.drop_duplicates()
+    dfd.add_sample(partitions, accuracy)
+    dependencies = DfdDependencies(partitions.columns)
+    non_uniq = dfd.add_unique_lhss(dependencies, partitions, index)
+    search, constants, equivalents = dfd.split_equivalent_columns(partitions, non_uniq)
+    agree = set()
+    if accuracy == 1:
+        agree = sample_agree_sets(partitions, search)
+    for rhs in bits(search):
+        lhss = find_LHSs(rhs, search, partitions, accuracy, agree, max_lhs_size)
+        dependencies.add_LHSs(partitions.columns[rhs], lhss)
+    dfd.add_equivalent_lhss(dependencies, partitions, accuracy, search, constants, equivalents)
+    return dependencies
+
+
+def find_LHSs(rhs, attrs, partitions, accuracy, agree, max_lhs_size=None):
+    """
+    Finds all the minimal LHSs of rhs. The candidates are the minimal sets
+    hitting the complement of each known non-dependency. Candidates that hold
+    are minimal dependencies, since all their subsets are known
+    non-dependencies. The ones that do not hold add new non-dependencies, and
+    only the candidates they contain are specialized.
+
+    Arguments:
+        rhs (int) : position of column for which we are investigating dependencies
+
+        attrs (int) : bitmask of the columns to consider as LHS attributes
+
+        partitions (PartitionCache) : encoded columns of the data
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency
+
+        agree (set[int]) : agree sets of row pairs found so far, the agree
+        sets of rows violating a candidate are added to it
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        to search for, unbounded if None
+
+    Returns:
+        lhss (LHSs) : all the LHS that determine rhs
+    """
+    lhs_attrs = attrs & ~(1 << rhs)
+    min_deps = LHSs(lhs_attrs)
+    candidates = Candidates(lhs_attrs, max_lhs_size)
+    candidates.specialize(maximal_sets(ag & lhs_attrs for ag in agree if not ag >> rhs & 1))
+    checked = set()
+    unchecked = candidates.sets - checked
+    while unchecked:
+        found = set()
+        for lhs in unchecked:
+            if dfd.compute_partitions(rhs, lhs, partitions, accuracy):
+                min_deps.add_dep(lhs)
+            elif accuracy < 1:
+                found.add(lhs)
+            else:
+                violating = violating_agree_sets(rhs, lhs, partitions, attrs)
+                agree |= violating
+                found |= set(ag & lhs_attrs for ag in violating)
+        checked |= unchecked
+        candidates.specialize(maximal_sets(found))
+        unchecked = candidates.sets - checked
+    return min_deps
+
+
+class Candidates(object):
+    """
+    The minimal sets of attributes hitting the complement of every
+    non-dependency added so far, indexed by attribute.
+
+    Attributes:
+        sets (set[int]) : bitmasks of the candidates
+    """
+
+    def __init__(self, lhs_attrs, max_lhs_size=None):
+        """
+        Creates the candidates for the empty set as only non-dependency,
+        the single attributes.
+
+        Arguments:
+            lhs_attrs (int) : bitmask of attributes being considered as parts of LHSs
+
+            max_lhs_size (int, optional) : largest number of attributes in a
+            candidate
+        """
+        self.sets = {0}
+        self._lhs_attrs = lhs_attrs
+        self._max_lhs_size = max_lhs_size
+        self._by_attr = {attr: set() for attr in bits(lhs_attrs)}
+        self.specialize([0])
+
+    def specialize(self, non_deps):
+        """
+        Replaces the candidates that are subsets of each of non_deps by their
+        minimal extensions with one attribute outside of it. An extension is
+        not minimal if a candidate kept already is a subset of it, which can
+        only be one containing the added attribute.
+
+        Arguments:
+            non_deps (iterable[int]) : bitmasks of the new non-dependencies
+        """
+        for non_dep in non_deps:
+            compliment = self._lhs_attrs & ~non_dep
+            hitting = set().union(*[self._by_attr[attr] for attr in bits(compliment)])
+            invalid = self.sets - hitting
+            if not invalid:
+                continue
+            self._remove(invalid)
+            new = set()
+            for seed in invalid:
+                if self._max_lhs_size is not None and bin(seed).count('1') >= self._max_lhs_size:
+                    continue
+                for attr in bits(compliment):
+                    new_seed = seed | (1 << attr)
+                    if not any(y & new_seed == y for y in self._by_attr[attr]):
+                        new.add(new_seed)
+            self._add(new)
+
+    def _add(self, seeds):
+        self.sets |= seeds
+        for seed in seeds:
+            for attr in bits(seed):
+                self._by_attr[attr].add(seed)
+
+    def _remove(self, seeds):
+        self.sets -= seeds
+        for seed in seeds:
+            for attr in bits(seed):
+                self._by_attr[attr].discard(seed)
+
+
+def sample_agree_sets(partitions, attrs):
+    """
+    Returns the agree sets of pairs of rows close to each other in the
+    classes of each column. Within a class of one column, rows are ordered
+    by the next column, so compared rows tend to agree on more columns.
+
+    Arguments:
+        partitions (PartitionCache) : encoded columns of the data
+
+        attrs (int) : bitmask of the columns to compare rows on
+
+    Returns:
+        agree (set[int]) : bitmasks of the agree sets
+    """
+    positions = bits(attrs)
+    agree = set()
+    for i, attr in enumerate(positions):
+        part = partitions.get(1 << attr)
+        labels = part.labels()
+        next_codes = partitions.codes(positions[(i + 1) % len(positions)])[part.rows]
+        order = numpy.lexsort((next_codes, labels))
+        rows = part.rows[order]
+        labels = labels[order]
+        for window in range(1, WINDOW + 1):
+            same = numpy.flatnonzero(labels[window:] == labels[:-window])
+            agree |= agree_sets(partitions, attrs, rows[same], rows[same + window])
+    return agree
+
+
+def violating_agree_sets(rhs, lhs, partitions, attrs):
+    """
+    Returns the agree sets of pairs of rows that show lhs --> rhs does not
+    hold exactly, one pair for each class of lhs with more than one value of
+    rhs. The pairs are looked for in the sample first.
+    """
+    cache = partitions
+    if partitions.sample is not None and dfd.refuted_by_sample(rhs, lhs, partitions, 1):
+        cache = partitions.sample
+    part = cache.get(lhs)
+    labels = part.labels()
+    codes = cache.codes(rhs)[part.rows]
+    firsts = part.starts[labels]
+    diff = numpy.flatnonzero(codes != codes[firsts])
+    _, index = numpy.unique(labels[diff], return_index=True)
+    diff = diff[index]
+    return agree_sets(cache, attrs, part.rows[firsts[diff]], part.rows[diff])
+
+
+def agree_sets(partitions, attrs, left, right):
+    """
+    Returns the distinct agree sets of the pairs of rows left[i], right[i].
+
+    Arguments:
+        partitions (PartitionCache) : encoded columns of the data
+
+        attrs (int) : bitmask of the columns to compare rows on
+
+        left (numpy.ndarray) : ids of the first row of each pair
+
+        right (numpy.ndarray) : ids of the second row of each pair
+
+    Returns:
+        agree (set[int]) : bitmasks of the columns in attrs each pair agrees on
+    """
+    positions = bits(attrs)
+    agree = set()
+    for start in range(0, len(left), PAIR_BATCH):
+        l_rows = left[start:start + PAIR_BATCH]
+        r_rows = right[start:start + PAIR_BATCH]
+        equal = numpy.column_stack([partitions.codes(attr)[l_rows] == partitions.codes(attr)[r_rows]
+                                    for attr in positions])
+        for packed in numpy.unique(numpy.packbits(equal, axis=1), axis=0):
+            found = int.from_bytes(packed.tobytes(), 'little')
+            # packbits puts the first column of each byte in its highest bit
+            agree.add(sum(1 << positions[b - b % 8 + 7 - b % 8] for b in bits(found)))
+    return agree
+
+
+def maximal_sets(sets):
+    """
+    Returns the sets that are not a proper subset of another one. Kept sets
+    are indexed by attribute, so a set is only compared with the kept sets
+    containing its least common attribute.
+
+    Arguments:
+        sets (iterable[int]) : bitmasks
+
+    Returns:
+        maximal (list[int]) : the maximal bitmasks
+    """
+    maximal = []
+    by_attr = {}
+    for x in sorted(set(sets), key=lambda x: -bin(x).count('1')):
+        if x == 0:
+            continue
+        attrs = bits(x)
+        rarest = min(attrs, key=lambda attr: len(by_attr.get(attr, ())))
+        if any(x & y == x for y in by_attr.get(rarest, ())):
+            continue
+        maximal.append(x)
+        for attr in attrs:
+            by_attr.setdefault(attr, []).append(x)
+    return maximal
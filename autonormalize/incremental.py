@@ -0,0 +1,493 @@
+import pickle
+
+import numpy
+
+from . import dfd
+from .classes import (
+    DfdDependencies,
+    LHSs,
+    PartitionCache,
+    ValueCodes,
+    bits,
+    code_dtype
+)
+
+
+class GroupCounts(object):
+    """
+    Counts of the RHS values seen for each combination of LHS values of one
+    LHS --> RHS pair. Keeps the g3 error of the pair (see TANE section 2.3)
+    up to date as rows are added, without looking at rows added before.
+
+    The counts are kept in numpy arrays sorted by key, the key of a
+    combination being the bytes of its codes, each code in the smallest
+    integer dtype that holds it. The combinations of the added rows are
+    looked up with searchsorted, so adding rows takes time proportional to
+    the number of new rows, apart from copying the arrays to insert new
+    combinations. Combinations of LHS values seen in a single row, most of
+    them when the LHS is nearly unique, only keep their RHS code.
+
+    Attributes:
+        g3 (int) : the number of rows that have to be removed for LHS --> RHS
+        to hold on all rows added so far
+
+        _dtypes (list[numpy.dtype] or None) : dtype of the codes of each LHS
+        column and of the RHS column in the keys, None until rows are added
+
+        _singles (numpy.ndarray) : sorted keys of the combinations of LHS
+        codes seen in a single row
+
+        _single_rhs (numpy.ndarray) : the RHS code of each of _singles
+
+        _groups (numpy.ndarray) : sorted keys of the other combinations of
+        LHS codes
+
+        _group_counts (numpy.ndarray) : number of rows with each of _groups
+
+        _group_max (numpy.ndarray) : count of the most common RHS code for
+        each of _groups
+
+        _pairs (numpy.ndarray) : sorted keys of the combinations of LHS
+        codes in _groups followed by a RHS code
+
+        _pair_counts (numpy.ndarray) : number of rows with each of _pairs
+    """
+
+    def __init__(self):
+        self.g3 = 0
+        self._dtypes = None
+
+    def add(self, lhs_codes, rhs_codes):
+        """
+        Adds rows to the counts and returns the updated g3 error.
+
+        Arguments:
+            lhs_codes (list[numpy.ndarray]) : codes of the new rows for each
+            of the LHS columns
+
+            rhs_codes (numpy.ndarray) : codes of the new rows for the RHS column
+
+        Returns:
+            g3 (int) : g3 error of LHS --> RHS over all rows added so far
+        """
+        if len(rhs_codes) == 0:
+            return self.g3
+        columns = lhs_codes + [rhs_codes]
+        self._fit([code_dtype(int(codes.max()) + 1) for codes in columns])
+        lhs_dtypes = self._dtypes[:-1]
+        pairs, first, counts = numpy.unique(to_keys(columns, self._dtypes), return_index=True, return_counts=True)
+        groups = to_keys([codes[first] for codes in lhs_codes], lhs_dtypes)
+
+        # groups seen in a single row before are counted again with that row
+        at, found = find_keys(self._singles, groups)
+        revived = numpy.unique(at[found])
+        if len(revived) > 0:
+            old_groups = self._singles[revived]
+            old_pairs = to_keys(from_keys(old_groups, lhs_dtypes) + [self._single_rhs[revived]], self._dtypes)
+            self._singles = numpy.delete(self._singles, revived)
+            self._single_rhs = numpy.delete(self._single_rhs, revived)
+            pairs, first, inverse = numpy.unique(numpy.concatenate([pairs, old_pairs]),
+                                                 return_index=True, return_inverse=True)
+            groups = numpy.concatenate([groups, old_groups])[first]
+            counts = sum_by(inverse, numpy.concatenate([counts, numpy.ones(len(old_pairs), dtype=counts.dtype)]),
+                            len(pairs))
+
+        # pairs are sorted by key, and so by the key of their group
+        batch_groups, inverse = numpy.unique(groups, return_inverse=True)
+        added = sum_by(inverse, counts, len(batch_groups))
+        at, found = find_keys(self._groups, batch_groups)
+        single = ~found & (added == 1)
+        single_pairs = single[inverse]
+        if single.any():
+            rhs = from_keys(pairs[single_pairs], self._dtypes)[-1]
+            where = numpy.searchsorted(self._singles, batch_groups[single])
+            self._singles = numpy.insert(self._singles, where, batch_groups[single])
+            self._single_rhs = numpy.insert(self._single_rhs, where, rhs)
+
+        pairs, counts, inverse = pairs[~single_pairs], counts[~single_pairs], inverse[~single_pairs]
+        at_pairs, found_pairs = find_keys(self._pairs, pairs)
+        self._pair_counts[at_pairs[found_pairs]] += counts[found_pairs]
+        totals = counts.copy()
+        totals[found_pairs] = self._pair_counts[at_pairs[found_pairs]]
+        self._pairs = numpy.insert(self._pairs, at_pairs[~found_pairs], pairs[~found_pairs])
+        self._pair_counts = numpy.insert(self._pair_counts, at_pairs[~found_pairs], counts[~found_pairs])
+        most = numpy.zeros(len(batch_groups), dtype=numpy.int64)
+        numpy.maximum.at(most, inverse, totals)
+
+        old_counts = self._group_counts[at[found]]
+        old_max = self._group_max[at[found]]
+        new_counts = old_counts + added[found]
+        new_max = numpy.maximum(old_max, most[found])
+        self._group_counts[at[found]] = new_counts
+        self._group_max[at[found]] = new_max
+        new = ~found & ~single
+        self.g3 += int((new_counts - new_max).sum() - (old_counts - old_max).sum() + (added[new] - most[new]).sum())
+        self._groups = numpy.insert(self._groups, at[new], batch_groups[new])
+        self._group_counts = numpy.insert(self._group_counts, at[new], added[new])
+        self._group_max = numpy.insert(self._group_max, at[new], most[new])
+        return self.g3
+
+    def _fit(self, dtypes):
+        """
+        Makes the keys hold codes of the given dtypes, rewriting them if a
+        column needs a larger dtype than before.
+        """
+        if self._dtypes is not None:
+            dtypes = [max(old, new, key=lambda dtype: dtype.itemsize) for old, new in zip(self._dtypes, dtypes)]
+            if dtypes == self._dtypes:
+                return
+        old_dtypes = self._dtypes
+        self._dtypes = dtypes
+        if old_dtypes is None:
+            empty = [numpy.empty(0, dtype=dtype) for dtype in dtypes]
+            self._singles = to_keys(empty[:-1], dtypes[:-1])
+            self._single_rhs = empty[-1]
+            self._groups = self._singles.copy()
+            self._group_counts = numpy.empty(0, dtype=numpy.int64)
+            self._group_max = numpy.empty(0, dtype=numpy.int64)
+            self._pairs = to_keys(empty, dtypes)
+            self._pair_counts = numpy.empty(0, dtype=numpy.int64)
+            return
+        # a larger dtype changes the order of the keys
+        self._singles, order = refit(self._singles, old_dtypes[:-1], dtypes[:-1])
+        self._single_rhs = self._single_rhs[order].astype(dtypes[-1])
+        self._groups, order = refit(self._groups, old_dtypes[:-1], dtypes[:-1])
+        self._group_counts = self._group_counts[order]
+        self._group_max = self._group_max[order]
+        self._pairs, order = refit(self._pairs, old_dtypes, dtypes)
+        self._pair_counts = self._pair_counts[order]
+
+
+def to_keys(columns, dtypes):
+    """
+    Returns the bytes of the codes of each row, with the codes of each
+    column in the given dtype, as a single value, so combinations of codes
+    can be sorted and searched as a 1d array.
+    """
+    record = numpy.dtype([('f{}'.format(i), dtype) for i, dtype in enumerate(dtypes)])
+    rows = numpy.empty(len(columns[0]), dtype=record)
+    for i, codes in enumerate(columns):
+        rows['f{}'.format(i)] = codes
+    return rows.view(numpy.dtype((numpy.void, record.itemsize)))
+
+
+def from_keys(keys, dtypes):
+    """
+    Returns the codes of each column in keys made by to_keys.
+    """
+    record = numpy.dtype([('f{}'.format(i), dtype) for i, dtype in enumerate(dtypes)])
+    rows = keys.view(record)
+    return [rows['f{}'.format(i)].copy() for i in range(len(dtypes))]
+
+
+def refit(keys, old_dtypes, new_dtypes):
+    """
+    Returns keys with their codes converted to new_dtypes and sorted again,
+    and the order of the old keys in the new ones.
+    """
+    keys = to_keys(from_keys(keys, old_dtypes), new_dtypes)
+    order = numpy.argsort(keys, kind='stable')
+    return keys[order], order
+
+
+def find_keys(keys, new):
+    """
+    Looks up the sorted keys new in the sorted keys. Returns the position
+    of each of new in keys, or where it would be inserted, and whether it
+    was found.
+    """
+    at = numpy.searchsorted(keys, new)
+    found = numpy.zeros(len(new), dtype=bool)
+    inside = at < len(keys)
+    found[inside] = keys[at[inside]] == new[inside]
+    return at, found
+
+
+def sum_by(inverse, values, n):
+    """
+    Returns the sum of values for each of n groups, inverse giving the
+    group of each value.
+    """
+    sums = numpy.zeros(n, dtype=numpy.int64)
+    numpy.add.at(sums, inverse, values)
+    return sums
+
+
+class DependencyState(object):
+    """
+    The state of a dependency search that is kept so the dependencies can be
+    updated when rows are appended to the data, instead of searching again
+    from scratch.
+
+    For every RHS this keeps the minimal dependencies and a set of
+    non-dependencies that covers all the others, along with GroupCounts for
+    each of them. Appended rows can only break a dependency, or, with
+    accuracy < 1, turn a non-dependency into one by raising the allowed
+    error. So only these pairs are re-checked against the new rows, and the
+    lattice is only searched upward from the dependencies that broke. If a
+    non-dependency becomes a dependency, or a unique column stops being
+    unique, the affected searches are run again over all rows.
+
+    Attributes:
+        columns (list[str]) : names of the columns in the data
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold dependencies
+        were found with
+
+        index (str, optional) : name of column that is intended index
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        that was searched for, unbounded if None
+
+        n_rows (int) : number of rows seen so far
+
+        _values (list[ValueCodes]) : the codes of the values of each column
+
+        _codes (list[numpy.ndarray]) : codes of all the rows seen so far for
+        each column, in the first n_rows entries of arrays that grow by
+        doubling, in the smallest integer dtype that holds them
+
+        _unique (int) : bitmask of the columns treated as unique
+
+        _min_deps (dict[int --> set[int]]) : the minimal dependencies of each
+        RHS as bitmasks
+
+        _non_deps (dict[int --> set[int]]) : non-dependencies of each RHS,
+        every non-dependency is a subset of one of them
+
+        _counts (dict[tuple[int, int] --> GroupCounts]) : counts of each
+        (LHS, RHS) pair that is re-checked when rows are appended
+    """
+
+    def __init__(self, columns, accuracy, index=None, max_lhs_size=None):
+        self.columns = list(columns)
+        self.accuracy = accuracy
+        self.index = index
+        self.max_lhs_size = max_lhs_size
+        self.n_rows = 0
+        self._values = [ValueCodes() for _ in self.columns]
+        self._codes = [numpy.empty(0, dtype=code_dtype(0)) for _ in self.columns]
+        self._unique = 0
+        self._min_deps = {}
+        self._non_deps = {}
+        self._counts = {}
+
+    @classmethod
+    def from_df(cls, df, accuracy, index=None, max_lhs_size=None):
+        """
+        Finds the dependencies in df and returns the state of the search.
+
+        Arguments:
+            df (pd.DataFrame) : the dataframe containing the data
+
+            accuracy (0 < float <= 1.00) : the accuracy threshold required in
+            order to conclude a dependency
+
+            index (str, optional) : name of column that is intended index of df
+
+            max_lhs_size (int, optional) : largest number of attributes in a
+            LHS to search for, unbounded if None
+
+        Returns:
+            state (DependencyState) : state of the search over df
+        """
+        state = cls(df.columns, accuracy, index, max_lhs_size)
+        state._append_codes(df)
+        state._search()
+        return state
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a DependencyState saved with save.
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_codes'] = [codes[:self.n_rows].copy() for codes in self._codes]
+        return state
+
+    def save(self, path):
+        """
+        Saves the state to path, so it can be loaded and updated later.
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def append(self, df):
+        """
+        Updates the dependencies for rows appended to the data.
+
+        Arguments:
+            df (pd.DataFrame) : the new rows, with the same columns as the
+            data the state was made from
+        """
+        if list(df.columns) != self.columns:
+            raise ValueError('The appended rows must have the same columns as the original data')
+        values = [len(v) for v in self._values]
+        new_codes = self._append_codes(df)
+        if len(df) == 0:
+            return
+        for i in bits(self._unique):
+            if self.columns[i] == self.index:
+                continue
+            codes = new_codes[i]
+            # codes below the old number of values belong to old rows
+            if (codes < values[i]).any() or len(numpy.unique(codes)) < len(codes):
+                self._search()
+                return
+        partitions = None
+        limit = self.n_rows * (1 - self.accuracy)
+        for rhs in sorted(self._min_deps):
+            broken = [lhs for lhs in self._min_deps[rhs]
+                      if self._add_rows(lhs, rhs, new_codes) > limit]
+            flipped = self.accuracy < 1 and any(self._add_rows(lhs, rhs, new_codes) <= limit
+                                                for lhs in self._non_deps[rhs])
+            if not (broken or flipped):
+                continue
+            if partitions is None:
+                partitions = self._partitions()
+            if flipped:
+                self._search_rhs(rhs, partitions)
+            else:
+                self._search_up(rhs, broken, partitions)
+
+    def dfd_dependencies(self):
+        """
+        Returns the dependencies of all the rows seen so far.
+
+        Returns:
+            dependencies (DfdDependencies) : the minimal dependencies
+        """
+        dependencies = DfdDependencies(self.columns)
+        for i in bits(self._unique):
+            dependencies.add_unique_lhs(self.columns[i])
+        for rhs in sorted(self._min_deps):
+            lhss = LHSs(self._non_unique() & ~(1 << rhs))
+            for lhs in self._min_deps[rhs]:
+                lhss.add_dep(lhs)
+            dependencies.add_LHSs(self.columns[rhs], lhss)
+        return dependencies
+
+    def _append_codes(self, df):
+        """
+        Encodes the rows of df with the codes already given to each value,
+        giving new values the next free codes. Returns the codes of the rows.
+        """
+        new_codes = []
+        end = self.n_rows + len(df)
+        for i, col in enumerate(self.columns):
+            codes = self._values[i].encode(df[col])
+            new_codes.append(codes)
+            dtype = code_dtype(len(self._values[i]))
+            if end > len(self._codes[i]) or dtype.itemsize > self._codes[i].dtype.itemsize:
+                grown = numpy.empty(max(end, 2 * len(self._codes[i])), dtype=dtype)
+                grown[:self.n_rows] = self._codes[i][:self.n_rows]
+                self._codes[i] = grown
+            self._codes[i][self.n_rows:end] = codes
+        self.n_rows = end
+        return new_codes
+
+    def _all_codes(self, i):
+        return self._codes[i][:self.n_rows]
+
+    def _partitions(self):
+        partitions = PartitionCache({col: self._all_codes(i) for i, col in enumerate(self.columns)})
+        dfd.add_sample(partitions, self.accuracy)
+        return partitions
+
+    def _non_unique(self):
+        return ((1 << len(self.columns)) - 1) & ~self._unique
+
+    def _add_rows(self, lhs, rhs, codes):
+        return self._counts[(lhs, rhs)].add([codes[i] for i in bits(lhs)], codes[rhs])
+
+    def _track(self, lhs, rhs):
+        counts = GroupCounts()
+        counts.add([self._all_codes(i) for i in bits(lhs)], self._all_codes(rhs))
+        self._counts[(lhs, rhs)] = counts
+
+    def _tracked(self, rhs):
+        """
+        Returns the LHSs of rhs that are re-checked when rows are appended.
+        In exact mode non-dependencies stay non-dependencies, so only the
+        minimal dependencies are.
+        """
+        if self.accuracy < 1:
+            return self._min_deps[rhs] | self._non_deps[rhs]
+        return set(self._min_deps[rhs])
+
+    def _search(self):
+        """
+        Runs the whole dependency search over all rows seen so far.
+        """
+        partitions = self._partitions()
+        self._unique = 0
+        for i, col in enumerate(self.columns):
+            if partitions.get(1 << i).num_classes() == 0 or col == self.index:
+                self._unique |= 1 << i
+        self._min_deps = {}
+        self._non_deps = {}
+        self._counts = {}
+        for rhs in bits(self._non_unique()):
+            self._search_rhs(rhs, partitions)
+
+    def _search_rhs(self, rhs, partitions):
+        """
+        Runs the dependency search for rhs over all rows seen so far.
+        """
+        attrs = self._non_unique()
+        for lhs, i in list(self._counts):
+            if i == rhs:
+                del self._counts[(lhs, i)]
+        max_non_deps = LHSs(attrs & ~(1 << rhs))
+        min_deps = dfd.find_LHSs(rhs, attrs, partitions, self.accuracy, self.max_lhs_size, max_non_deps)
+        self._min_deps[rhs] = min_deps.all_sets()
+        self._non_deps[rhs] = max_non_deps.all_sets()
+        for lhs in self._tracked(rhs):
+            self._track(lhs, rhs)
+
+    def _search_up(self, rhs, broken, partitions):
+        """
+        Finds the new minimal dependencies of rhs after the dependencies in
+        broken stopped holding. No non-dependency became a dependency, so
+        every new minimal dependency is a superset of a broken one. Searches
+        the supersets of the broken dependencies level by level, going up
+        only from non-dependencies.
+        """
+        valid = self._min_deps[rhs] - set(broken)
+        lhs_attrs = self._non_unique() & ~(1 << rhs)
+        found = set()
+        non_deps = set(broken)
+        seen = set(broken)
+        level = list(broken)
+        while level != []:
+            next_level = []
+            for lhs in level:
+                for attr in bits(lhs_attrs & ~lhs):
+                    new = lhs | (1 << attr)
+                    if new in seen:
+                        continue
+                    seen.add(new)
+                    if self.max_lhs_size is not None and bin(new).count('1') > self.max_lhs_size:
+                        continue
+                    if any(dep & new == dep for dep in valid) or any(dep & new == dep for dep in found):
+                        continue
+                    if dfd.compute_partitions(rhs, new, partitions, self.accuracy):
+                        found.add(new)
+                    else:
+                        non_deps.add(new)
+                        next_level.append(new)
+            level = next_level
+        tracked = self._tracked(rhs)
+        new_deps = valid | set(x for x in found if not any(y & x == y and y != x for y in found))
+        self._min_deps[rhs] = new_deps
+        non_deps |= self._non_deps[rhs]
+        self._non_deps[rhs] = set(x for x in non_deps if not any(x & y == x and y != x for y in non_deps))
+        new_tracked = self._tracked(rhs)
+        for lhs in tracked - new_tracked:
+            del self._counts[(lhs, rhs)]
+        for lhs in new_tracked - tracked:
+            self._track(lhs, rhs)
@@ -1,6 +1,6 @@
 import pandas as pd
 
-from .classes import Dependencies
+from .classes import RowIndex
 
 
 def normalize(dependencies, df):
@@ -88,18 +88,12 @@ def make_indexes(depdf):
 
             add = [None] * len(depdf.parent.df)
             indices = depdf.parent.df.groupby(prim_key).indices
+            rows = RowIndex.from_df(depdf.df, prim_key)
+            new_vals = depdf.df['_'.join(prim_key)].to_numpy()
 
             for name in indices:
 
-                mask = None
-                for i in range(len(prim_key)):
-                    m = depdf.df[prim_key[i]] == name[i]
-                    if mask is None:
-                        mask = m
-                    else:
-                        mask = mask & m
-
-                new_val = depdf.df[mask]['_'.join(prim_key)].item()
+                new_val = new_vals[rows.get_rows(name)].item()
 
                 for index in indices[name]:
                     add[index] = new_val
@@ -272,39 +266,7 @@ def split_on_dep(lhs_dep, dependencies):
     Returns:
         new_groups ((Dependencies, Dependencies)) : the new groups
     """
-    new_deps = {}
-    old_deps = dependencies.serialize()
-
-    new_rhs = set()
-
-    # new primary key
-    for attr in lhs_dep:
-        new_deps[attr] = old_deps[attr][:]
-
-    for rhs in list(old_deps.keys()):
-        for lhs in old_deps[rhs]:
-            if set(lhs).issubset(lhs_dep):
-                # if lhs_dep in old_deps[rhs]:
-                new_deps[rhs] = old_deps[rhs]
-                old_deps.pop(rhs)
-                new_rhs.add(rhs)
-                break
-
-    for rhs in old_deps:
-        for lhs in old_deps[rhs][:]:
-            if len(new_rhs.intersection(lhs)) != 0:
-                old_deps[rhs].remove(lhs)
-
-    old_rhs = set(list(old_deps.keys()))
-    for attr in lhs_dep:
-        old_rhs.remove(attr)
-
-    for rhs in new_deps:
-        for lhs in new_deps[rhs][:]:
-            if len(old_rhs.intersection(lhs)) != 0:
-                new_deps[rhs].remove(lhs)
-
-    return (Dependencies(old_deps, dependencies.get_prim_key()), Dependencies(new_deps, lhs_dep))
+    return dependencies.split(lhs_dep)
 
 
 def drop_primary_dups(df, prim_key):
@@ -343,7 +305,7 @@ def choose_index(keys, df):
     3) has attribute furthest to the left in table
 
     Arguments:
-        keys (list[set[str]]) : list of keys to choose from
+        keys (iterable[set[str]]) : keys to choose from
         df (pd.DataFrame) : pandas dataframe keys are for
 
     Returns:
@@ -0,0 +1,127 @@
+from . import dfd
+from .classes import DfdDependencies, LHSs, PartitionCache, bits
+
+# see https://www.cs.helsinki.fi/research/fdk/datamining/tane/ for TANE paper
+
+
+def tane(df, accuracy, index=None, max_lhs_size=None):
+    """
+    Finds all the minimal dependencies in the data with the level-wise TANE
+    algorithm. Instead of a search per RHS, a single pass over the lattice of
+    column sets checks every set X for all the dependencies X \\ {A} --> A,
+    computing the partition of each set as the product of the partitions of
+    its subsets. Unique, constant and equivalent columns and the index are
+    handled as in dfd.
+
+    Arguments:
+
+        df (pd.Dataframe or PartitionCache) : the dataframe containing the
+        data to find the dependencies from, or the data already encoded
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency (i.e. with accuracy = 0.98, 0.98 of the rows
+        must hold true the dependency LHS --> RHS)
+
+        index (str, optional) : name of column that is intended index of df
+
+        max_lhs_size (int, optional) : largest number of attributes in a LHS
+        to search for, unbounded if None
+
+    Returns:
+
+        minimal_dependencies (DfdDependencies) : the minimal dependencies
+        represented by the data in df
+    """
+    if isinstance(df, PartitionCache):
+        partitions = df
+    else:
+        partitions = PartitionCache.from_df(df)
+    partitions.drop_duplicates()
+    dfd.add_sample(partitions, accuracy)
+    dependencies = DfdDependencies(partitions.columns)
+    non_uniq = dfd.add_unique_lhss(dependencies, partitions, index)
+    search, constants, equivalents = dfd.split_equivalent_columns(partitions, non_uniq)
+    lhss = {rhs: LHSs(search & ~(1 << rhs)) for rhs in bits(search)}
+
+    # rhs candidates C+(X) of every set X in the current level
+    level = {1 << attr: search for attr in bits(search)}
+    size = 1
+    while level:
+        if size > 1:
+            compute_dependencies(level, lhss, partitions, accuracy)
+            level = {attrs: cands for attrs, cands in level.items() if cands != 0}
+        if max_lhs_size is not None and size > max_lhs_size:
+            break
+        level = next_level(level)
+        size += 1
+
+    for rhs in bits(search):
+        dependencies.add_LHSs(partitions.columns[rhs], lhss[rhs])
+    dfd.add_equivalent_lhss(dependencies, partitions, accuracy, search, constants, equivalents)
+    return dependencies
+
+
+def compute_dependencies(level, lhss, partitions, accuracy):
+    """
+    Checks X \\ {A} --> A for every set X in level and every A in both X and
+    the rhs candidates of X. Found dependencies are added to lhss, and the rhs
+    candidates are reduced so only minimal dependencies are checked later
+    (see TANE section 4.2). The candidates outside of X are only removed if
+    the dependency holds exactly, since approximate dependencies are not
+    transitive.
+
+    Arguments:
+        level (dict[int --> int]) : rhs candidates of each set in the level,
+        updated in place
+
+        lhss (dict[int --> LHSs]) : LHSs found for each rhs
+
+        partitions (PartitionCache) : encoded columns of the data
+
+        accuracy (0 < float <= 1.00) : the accuracy threshold required in order
+        to conclude a dependency
+    """
+    for attrs, cands in level.items():
+        for rhs in bits(attrs & cands):
+            lhs = attrs & ~(1 << rhs)
+            if dfd.compute_partitions(rhs, lhs, partitions, accuracy):
+                lhss[rhs].add_dep(lhs)
+                cands &= ~(1 << rhs)
+                if accuracy == 1 or partitions.size(lhs) == partitions.size(attrs):
+                    cands &= attrs
+        level[attrs] = cands
+
+
+def next_level(level):
+    """
+    Returns the sets one attribute larger than the sets in level whose
+    subsets are all in level, with their rhs candidates: the intersection of
+    the candidates of the subsets. Sets are generated by joining pairs of
+    sets that only differ in their highest attribute.
+
+    Arguments:
+        level (dict[int --> int]) : rhs candidates of each set in the level
+
+    Returns:
+        next_level (dict[int --> int]) : rhs candidates of each set in the
+        next level
+    """
+    blocks = {}
+    for attrs in level:
+        high = attrs.bit_length() - 1
+        blocks.setdefault(attrs & ~(1 << high), []).append(attrs)
+    new_level = {}
+    for block in blocks.values():
+        block.sort()
+        for i, x in enumerate(block):
+            for y in block[i + 1:]:
+                new = x | y
+                cands = level[x] & level[y]
+                for attr in bits(new):
+                    subset = new & ~(1 << attr)
+                    if subset not in level:
+                        break
+                    cands &= level[subset]
+                else:
+                    new_level[new] = cands
+    return new_level
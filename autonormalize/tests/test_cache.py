@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+import autonormalize as an
+from autonormalize import dfd
+from autonormalize.cache import DependencyCache
+from autonormalize.classes import Dependencies
+
+path = os.getcwd()
+
+df_2 = pd.read_csv(os.path.join(path, 'autonormalize/examples/example_3'))
+
+
+def test_find_dependencies_cache(tmpdir, monkeypatch):
+    cache = DependencyCache(str(tmpdir))
+    expected = an.find_dependencies(df_2, cache=cache)
+    assert expected.serialize() == an.find_dependencies(df_2).serialize()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('dependencies are searched again')
+    with monkeypatch.context() as m:
+        m.setattr(dfd, 'dfd', fail)
+        deps = an.find_dependencies(df_2, cache=str(tmpdir))
+        assert deps.serialize() == expected.serialize()
+        assert deps.get_prim_key() == expected.get_prim_key()
+        with pytest.raises(AssertionError):
+            an.find_dependencies(df_2, accuracy=0.95, cache=cache)
+        changed = df_2.copy()
+        changed.loc[0, 'B'] += 1
+        with pytest.raises(AssertionError):
+            an.find_dependencies(changed, cache=cache)
+
+
+def test_cache_sizes(tmpdir):
+    cache = DependencyCache(str(tmpdir))
+    df = df_2[['C', 'D', 'G']]
+    hashes = DependencyCache.column_hashes(df)
+    cache.put(DependencyCache.key(hashes, 0.98, None, None), Dependencies({}), hashes, {0b011: 5, 0b110: 7})
+
+    sizes = cache.sizes(DependencyCache.column_hashes(df_2[['G', 'D']]))
+    assert sizes == {0b011: 7}
+    assert cache.sizes(DependencyCache.column_hashes(df_2[['B']])) == {}
+
+
+def test_cache_eviction(tmpdir):
+    cache = DependencyCache(str(tmpdir), max_bytes=1)
+    an.find_dependencies(df_2, cache=cache)
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_cache_missing_files(tmpdir, monkeypatch):
+    cache = DependencyCache(str(tmpdir), max_bytes=1)
+    hashes = DependencyCache.column_hashes(df_2[['C', 'D']])
+    key = DependencyCache.key(hashes, 0.98, None, None)
+    paths = cache._paths
+    gone = os.path.join(str(tmpdir), 'gone.pkl')
+    monkeypatch.setattr(cache, '_paths', lambda *args: paths(*args) + [gone])
+    cache.put(key, Dependencies({}), hashes, {0b11: 5})
+    assert cache.get(key) is None
+    assert cache.sizes(hashes) == {}
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_cache_sizes_read_once(tmpdir, monkeypatch):
+    cache = DependencyCache(str(tmpdir))
+    hashes = DependencyCache.column_hashes(df_2[['C', 'D']])
+    cache.put(DependencyCache.key(hashes, 0.98, None, None), Dependencies({}), hashes, {0b11: 5})
+    loaded = []
+    load = cache._load
+    monkeypatch.setattr(cache, '_load', lambda path: loaded.append(path) or load(path))
+    assert cache.sizes(hashes) == {0b11: 5}
+    assert cache.sizes(hashes) == {0b11: 5}
+    assert len(loaded) == 1 and loaded[0].endswith('.sizes')
+    assert not any(name.endswith('.tmp') for name in os.listdir(str(tmpdir)))
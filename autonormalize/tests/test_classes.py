@@ -1,10 +1,25 @@
+from itertools import combinations
+
+import numpy
+import pandas as pd
+
 from autonormalize.classes import (
+    BoundedCache,
+    Closure,
+    CodeStore,
     Dependencies,
     DfdDependencies,
+    Lattice,
     LHSs,
-    find_closure
+    RowIndex,
+    StrippedPartition,
+    ValueCodes,
+    find_closure,
+    to_mask
 )
 
+ATTRS = ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+
 
 def assert_equal_dependency_dics(dep1, dep2):
 
@@ -31,54 +46,83 @@ def assert_equal_tuple_rels(rels1, rels2):
 
 
 def test_all_sets_and_add_dep():
-    lhss = LHSs(['a', 'b', 'c', 'd', 'e', 'f', 'g'])
+    lhss = LHSs(to_mask('abcdefg', ATTRS))
     assert lhss.all_sets() == set()
-    set_1 = frozenset(['a', 'c', 'd'])
+    set_1 = to_mask(['a', 'c', 'd'], ATTRS)
     lhss.add_dep(set_1)
     assert lhss.all_sets() == set([set_1])
-    set_2 = frozenset(['a', 'c', 'e', 'f', 'g'])
-    set_3 = frozenset(['b'])
+    set_2 = to_mask(['a', 'c', 'e', 'f', 'g'], ATTRS)
+    set_3 = to_mask(['b'], ATTRS)
     lhss.add_dep(set_2)
     lhss.add_dep(set_3)
     assert lhss.all_sets() == set([set_1, set_2, set_3])
 
 
 def test_contains_subset():
-    lhss = LHSs(['a', 'b', 'c', 'd', 'e', 'f', 'g'])
-    set_1 = frozenset(['a', 'c', 'd'])
+    lhss = LHSs(to_mask('abcdefg', ATTRS))
+    set_1 = to_mask(['a', 'c', 'd'], ATTRS)
     lhss.add_dep(set_1)
-    set_2 = frozenset(['a', 'c', 'e', 'f', 'g'])
-    set_3 = frozenset(['g'])
+    set_2 = to_mask(['a', 'c', 'e', 'f', 'g'], ATTRS)
+    set_3 = to_mask(['g'], ATTRS)
     lhss.add_dep(set_2)
     lhss.add_dep(set_3)
     assert lhss.contains_subset(set_1)
-    assert lhss.contains_subset(frozenset(['a', 'c', 'd', 'f']))
-    assert not lhss.contains_subset(frozenset(['b']))
+    assert lhss.contains_subset(to_mask(['a', 'c', 'd', 'f'], ATTRS))
+    assert not lhss.contains_subset(to_mask(['b'], ATTRS))
 
 
 def test_contains_superset():
-    lhss = LHSs(['a', 'b', 'c', 'd', 'e', 'f', 'g'])
-    set_1 = frozenset(['a', 'c', 'd', 'e', 'g'])
+    lhss = LHSs(to_mask('abcdefg', ATTRS))
+    set_1 = to_mask(['a', 'c', 'd', 'e', 'g'], ATTRS)
     lhss.add_dep(set_1)
-    set_2 = frozenset(['a', 'c', 'e', 'f'])
-    set_3 = frozenset(['b', 'c'])
+    set_2 = to_mask(['a', 'c', 'e', 'f'], ATTRS)
+    set_3 = to_mask(['b', 'c'], ATTRS)
     lhss.add_dep(set_2)
     lhss.add_dep(set_3)
     assert lhss.contains_superset(set_1)
-    assert lhss.contains_superset(frozenset(['a', 'c', 'f']))
-    assert not lhss.contains_superset(frozenset(['a', 'b', 'c']))
+    assert lhss.contains_superset(to_mask(['a', 'c', 'f'], ATTRS))
+    assert not lhss.contains_superset(to_mask(['a', 'b', 'c'], ATTRS))
+
+
+def test_LHSs_brute_force():
+    rng = numpy.random.RandomState(0)
+    for _ in range(20):
+        lhss = LHSs(2 ** 12 - 1)
+        stored = [int(x) for x in rng.randint(1, 2 ** 12, rng.randint(1, 60))]
+        for lhs in stored:
+            lhss.add_dep(lhs)
+        for query in rng.randint(0, 2 ** 12, 200):
+            query = int(query)
+            assert lhss.contains_subset(query) == any(lhs & query == lhs for lhs in stored)
+            assert lhss.contains_superset(query) == (query != 0 and any(lhs & query == query for lhs in stored))
+
+
+def test_LHSs_remove_dep():
+    rng = numpy.random.RandomState(0)
+    lhss = LHSs(2 ** 10 - 1)
+    stored = set(int(x) for x in rng.randint(1, 2 ** 10, 40))
+    for lhs in stored:
+        lhss.add_dep(lhs)
+    for lhs in list(stored)[:20]:
+        lhss.remove_dep(lhs)
+        stored.remove(lhs)
+        assert lhs not in lhss
+    assert lhss.all_sets() == stored
+    for query in range(2 ** 10):
+        assert lhss.contains_subset(query) == any(lhs & query == lhs for lhs in stored)
+        assert lhss.contains_superset(query) == (query != 0 and any(lhs & query == query for lhs in stored))
 
 
 def test_LHSs_add_dep_and_all_sets():
-    lhss = LHSs(['a', 'b', 'c', 'd', 'e', 'f', 'g'])
+    lhss = LHSs(to_mask('abcdefg', ATTRS))
     assert lhss.all_sets() == set()
-    set_1 = frozenset(['a', 'c', 'd', 'e', 'g'])
+    set_1 = to_mask(['a', 'c', 'd', 'e', 'g'], ATTRS)
     lhss.add_dep(set_1)
     assert lhss.all_sets() == set([set_1])
-    set_2 = frozenset(['a', 'c', 'e', 'f'])
+    set_2 = to_mask(['a', 'c', 'e', 'f'], ATTRS)
     lhss.add_dep(set_2)
     assert lhss.all_sets() == set([set_1, set_2])
-    set_3 = frozenset(['b', 'c'])
+    set_3 = to_mask(['b', 'c'], ATTRS)
     lhss.add_dep(set_3)
     assert lhss.all_sets() == set([set_1, set_2, set_3])
 
@@ -93,12 +137,13 @@ def test_add_unique_lhs():
 
 
 def test_add_LHSs():
-    lhss_weight = LHSs(set(["name", "age", "height", "weight", "location", "speed", "rating", "experience", "mother"]))
-    lhss_weight.add_dep(frozenset(["name"]))
-    lhss_weight.add_dep(frozenset(["age", "height"]))
-    lhss_age = LHSs(set(["name", "age", "height", "weight", "location", "speed", "rating", "experience", "mother"]))
-    lhss_age.add_dep(frozenset(["name"]))
-    dependencies = DfdDependencies(["name", "age", "height", "weight", "location", "speed", "rating", "experience", "mother"])
+    attrs = ["name", "age", "height", "weight", "location", "speed", "rating", "experience", "mother"]
+    lhss_weight = LHSs(to_mask(attrs, attrs))
+    lhss_weight.add_dep(to_mask(["name"], attrs))
+    lhss_weight.add_dep(to_mask(["age", "height"], attrs))
+    lhss_age = LHSs(to_mask(attrs, attrs))
+    lhss_age.add_dep(to_mask(["name"], attrs))
+    dependencies = DfdDependencies(attrs)
     dependencies.add_LHSs("age", lhss_age)
     assert_equal_dependency_dics(dependencies.serialize(), {"rating": [], "age": [["name"]], "height": [], "weight": [],
                                                             "location": [], "speed": [],
@@ -141,11 +186,32 @@ def test_remove_implied_extroneous():
     assert dependencies.serialize() == {'A': [], 'B': [['A']], 'C': [['A']]}
 
 
-# def test_remove_redundant():
-#     dep_dic = {'A': [], 'B': [['A']], 'C': [['B']], 'D': [['A'], ['C']]}
-#     dependencies = Dependencies(dep_dic)
-#     dependencies.remove_redundant()
-#     assert dependencies.serialize() == {'A': [], 'B': [['A']], 'C': [['B']], 'D': [['A']]}
+def test_minimal_cover():
+    dep_dic = {'A': [], 'B': [['A']], 'C': [['B'], ['A', 'B']], 'D': [['A'], ['C']]}
+    dependencies = Dependencies(dep_dic)
+    dependencies.minimal_cover()
+    assert dependencies.serialize() == {'A': [], 'B': [['A']], 'C': [['B']], 'D': [['C']]}
+
+    rng = numpy.random.RandomState(0)
+    attrs = list('ABCDEFG')
+    for _ in range(30):
+        dep_dic = {attr: [] for attr in attrs}
+        for _ in range(rng.randint(2, 15)):
+            rhs = rng.choice(attrs)
+            others = [attr for attr in attrs if attr != rhs]
+            dep_dic[rhs].append(list(rng.choice(others, rng.randint(1, 4), replace=False)))
+        original = Dependencies(dep_dic)
+        cover = Dependencies(original.serialize())
+        cover.minimal_cover()
+        for size in range(len(attrs)):
+            for comb in combinations(attrs, size):
+                assert cover.find_closure(comb) == original.find_closure(comb)
+        rels = cover.tuple_relations()
+        for lhs, rhs in rels:
+            others = [rel for rel in rels if rel != (lhs, rhs)]
+            assert rhs not in find_closure(others, lhs)
+            for attr in lhs:
+                assert rhs not in cover.find_closure([x for x in lhs if x != attr])
 
 
 def test_find_candidate_keys():
@@ -155,6 +221,47 @@ def test_find_candidate_keys():
     dependencies = Dependencies(dep_dic)
     dependencies.remove_implied_extroneous()
     assert_equal_cand_keys(dependencies.find_candidate_keys(), [{'A', 'G'}, {'B', 'G'}, {'E', 'G'}])
+    assert len(dependencies.find_candidate_keys(max_keys=2)) == 2
+    assert dependencies.find_candidate_keys(max_key_size=1) == []
+
+
+def test_find_candidate_keys_brute_force():
+    rng = numpy.random.RandomState(0)
+    attrs = list('ABCDEFGH')
+    for _ in range(30):
+        dep_dic = {attr: [] for attr in attrs}
+        for _ in range(rng.randint(2, 12)):
+            rhs = rng.choice(attrs)
+            others = [attr for attr in attrs if attr != rhs]
+            dep_dic[rhs].append(list(rng.choice(others, rng.randint(1, 4), replace=False)))
+        dependencies = Dependencies(dep_dic)
+        superkeys = [set(comb) for size in range(len(attrs) + 1) for comb in combinations(attrs, size)
+                     if dependencies.find_closure(comb) == set(attrs)]
+        expected = [key for key in superkeys if not any(other < key for other in superkeys)]
+        assert_equal_cand_keys(dependencies.find_candidate_keys(), expected)
+        assert_equal_cand_keys(dependencies.find_candidate_keys(max_key_size=3),
+                               [key for key in expected if len(key) <= 3])
+
+
+def test_find_candidate_keys_smallest_first():
+    dep_dic = {'id': [['A', 'B', 'C']], 'A': [['id'], ['D', 'E']], 'B': [['id'], ['D', 'F']],
+               'C': [['id'], ['E', 'F']], 'D': [['id'], ['A', 'B']], 'E': [['id'], ['A', 'C']],
+               'F': [['id'], ['B', 'C']]}
+    dependencies = Dependencies(dep_dic)
+    assert dependencies.find_candidate_keys(max_keys=1) == [{'id'}]
+
+    rng = numpy.random.RandomState(0)
+    attrs = list('ABCDEFGH')
+    for _ in range(30):
+        dep_dic = {attr: [] for attr in attrs}
+        for _ in range(rng.randint(2, 16)):
+            rhs = rng.choice(attrs)
+            others = [attr for attr in attrs if attr != rhs]
+            dep_dic[rhs].append(list(rng.choice(others, rng.randint(1, 4), replace=False)))
+        dependencies = Dependencies(dep_dic)
+        smallest = min(len(key) for key in dependencies.find_candidate_keys())
+        if smallest <= 2:
+            assert len(dependencies.find_candidate_keys(max_keys=1)[0]) == smallest
 
 
 def test_find_partial_deps():
@@ -175,6 +282,46 @@ def test_find_closure():
     rels = dependencies.tuple_relations()
     clos = {'A', 'B', 'D', 'E'}
     assert find_closure(rels, ['A']) == clos
+    assert dependencies.find_closure(['A']) == clos
+    assert dependencies.find_closure(['G', 'E']) == {'A', 'B', 'C', 'D', 'E', 'F', 'G'}
+    dependencies.remove_dep('E', ['A'])
+    assert dependencies.find_closure(['A']) == {'A', 'B', 'D'}
+    dependencies.add_dep('G', ['D'])
+    assert dependencies.find_closure(['A']) == {'A', 'B', 'D', 'F', 'G'}
+    assert find_closure([([], 'A'), (['A'], 'B'), (['B', 'C'], 'D')], ['C']) == {'A', 'B', 'C', 'D'}
+
+
+def test_find_closure_fixpoint():
+    rng = numpy.random.RandomState(0)
+    attrs = list('ABCDEFGH')
+    for _ in range(50):
+        rels = [(list(rng.choice(attrs, rng.randint(0, 3), replace=False)), rng.choice(attrs)) for _ in range(10)]
+        for size in range(3):
+            start = list(rng.choice(attrs, size, replace=False))
+            closure = set(start)
+            while True:
+                new = closure | set(rhs for lhs, rhs in rels if set(lhs) <= closure)
+                if new == closure:
+                    break
+                closure = new
+            assert find_closure(rels, start) == closure
+
+
+def test_closure_is_redundant():
+    rng = numpy.random.RandomState(0)
+    attrs = list('ABCDEFGH')
+    for _ in range(50):
+        rels = [(list(rng.choice(attrs, rng.randint(1, 3), replace=False)), rng.choice(attrs)) for _ in range(10)]
+        closure = Closure(rels)
+        kept = list(rels)
+        for i, (lhs, rhs) in enumerate(rels):
+            others = [rel for rel in kept if rel is not rels[i]]
+            redundant = rhs in find_closure(others, lhs)
+            assert closure.is_redundant(i, lhs) == redundant
+            if redundant:
+                kept = others
+        for start in attrs:
+            assert closure.find([start]) == find_closure(kept, [start])
 
 
 def test_from_rels():
@@ -187,6 +334,20 @@ def test_from_rels():
     assert dependencies.serialize() == dependencies_new.serialize()
 
 
+def test_split_shares_lhss():
+    dep_dic = {'A': [], 'B': [['A']], 'C': [['B']], 'D': [['C'], ['A', 'B']], 'E': [['A']]}
+    dependencies = Dependencies(dep_dic, ['A'])
+    old, new = dependencies.split(['C'])
+    assert old.serialize() == {'A': [], 'B': [['A']], 'C': [['B']], 'E': [['A']]}
+    assert new.serialize() == {'C': [], 'D': [['C']]}
+    assert old._lhss['E'] is dependencies._lhss['E']
+    old.add_dep('E', ['B'])
+    assert dependencies.serialize() == dep_dic
+    serialized = dependencies.serialize()
+    serialized['B'].append(['E'])
+    assert dependencies.serialize() == dep_dic
+
+
 def test_find_trans_deps():
     dep_dic = {
         'A': [], 'B': [], 'C': [], 'D': [['F']],
@@ -201,3 +362,113 @@ def test_equi_atttrs():
     dep = Dependencies(dep_dic, ['A', 'C'])
     assert dep.equiv_attrs('A', 'B')
     assert not dep.equiv_attrs('A', 'D')
+
+
+def test_stripped_partition():
+    a = numpy.array([0, 1, 0, 2, 1, 0, 3])
+    b = numpy.array([0, 0, 1, 0, 0, 1, 0])
+    part = StrippedPartition.from_codes(a)
+    assert set(map(frozenset, numpy.split(part.rows, part.starts[1:]))) == {frozenset([0, 2, 5]), frozenset([1, 4])}
+    assert part.error() == 3
+    refined = part.refine(b)
+    assert set(map(frozenset, numpy.split(refined.rows, refined.starts[1:]))) == {frozenset([2, 5]), frozenset([1, 4])}
+    assert refined.error() == 2
+
+
+def test_g3_error():
+    lhs = numpy.array([0, 0, 0, 1, 1, 2, 3, 3, 3, 3])
+    rhs = numpy.array([5, 5, 6, 7, 8, 9, 1, 1, 2, 3])
+    part = StrippedPartition.from_codes(lhs)
+    assert part.g3_error(rhs) == 1 + 1 + 2
+    assert part.g3_error(lhs) == 0
+    weights = numpy.array([1, 1, 3, 1, 2, 1, 1, 1, 1, 1])
+    assert part.g3_error(rhs, weights) == 2 + 1 + 2
+
+
+def test_row_index():
+    df = pd.DataFrame({'a': [1, 2, 1, 3, 2, 1], 'b': ['x', 'y', 'y', 'x', 'y', 'y']})
+    index = RowIndex.from_df(df, ['a'])
+    assert list(index.get_rows(1)) == [0, 2, 5]
+    assert list(index.get_rows(3)) == [3]
+    assert list(index.get_rows(4)) == []
+    index = RowIndex.from_df(df, ['a', 'b'])
+    assert list(index.get_rows((1, 'y'))) == [2, 5]
+    assert list(index.get_rows((2, 'y'))) == [1, 4]
+    assert list(index.get_rows((3, 'y'))) == []
+    assert len(index.rows) == 6
+
+
+def test_bounded_cache():
+    cache = BoundedCache(100)
+    cache.put('a', 1, 40, 40)
+    cache.put('b', 2, 40, 400)
+    cache.put('c', 3, 40, 80)
+    # 'a' is the cheapest to compute again per byte
+    assert 'a' not in cache and cache.get('b') == 2 and cache.get('c') == 3
+    assert cache.nbytes == 80 and cache.evictions == 1
+    cache.put('d', 4, 200, 1000)
+    assert 'd' not in cache and len(cache) == 2
+    cache.set_max_bytes(50)
+    assert 'c' not in cache and cache.get('b') == 2
+    cache.clear()
+    assert cache.nbytes == 0 and cache.get('b') is None
+
+    cache = BoundedCache()
+    for i in range(100):
+        cache.put(i, i, 1000, 1)
+    assert len(cache) == 100
+    cache.set_max_bytes(10000)
+    assert len(cache) == 10 and cache.nbytes == 10000
+
+
+def test_lattice():
+    lattice = Lattice(0b1111)
+    node = lattice.node(0b0011)
+    assert len(lattice.nodes()) == 1
+    assert set(n.attrs for n in node.unchecked_supersets()) == {0b0111, 0b1011}
+    assert set(n.attrs for n in node.unchecked_subsets()) == {0b0001, 0b0010}
+    assert len(lattice.nodes()) == 5
+    for n in node.unchecked_subsets():
+        n.visited = True
+        n.category = -1
+    assert node.unchecked_subsets() == []
+    assert node.is_minimal()
+
+
+def test_lattice_infer_type():
+    lattice = Lattice(0b1111)
+    lattice.node(0b0011).category = 3
+    lattice.node(0b1100).category = -2
+    node = lattice.node(0b0111)
+    node.infer_type()
+    assert node.category == 1
+    node = lattice.node(0b0100)
+    node.infer_type()
+    assert node.category == -1
+    node = lattice.node(0b0011)
+    node.infer_type()
+    assert node.category == 3
+    lattice.node(0b0011).category = -1
+    node = lattice.node(0b1011)
+    node.category = 0
+    node.infer_type()
+    assert node.category == 0
+
+
+def test_value_codes():
+    values = ValueCodes()
+    assert list(values.encode(pd.Series(['x', None, 'y', 'x']))) == [0, 1, 2, 0]
+    assert list(values.encode(pd.Series(['z', 'y', numpy.nan]))) == [3, 2, 1]
+    assert len(values) == 4
+
+
+def test_code_store(monkeypatch):
+    monkeypatch.setattr('autonormalize.classes.COPY_ROWS', 100)
+    store = CodeStore(['a', 'b'])
+    store.append(pd.DataFrame({'a': numpy.arange(100) % 3, 'b': numpy.arange(100)}))
+    assert store.codes()['a'].dtype == numpy.int8 and store.codes()['b'].dtype == numpy.int8
+    store.append(pd.DataFrame({'a': numpy.arange(300) % 3, 'b': numpy.arange(300)}))
+    codes = store.codes()
+    assert codes['a'].dtype == numpy.int8 and codes['b'].dtype == numpy.int16
+    assert list(codes['a'][98:102]) == [2, 0, 0, 1]
+    assert list(codes['b'][:100]) == list(range(100)) and list(codes['b'][100:]) == list(range(300))
@@ -1,9 +1,14 @@
 import os
+import time
+from itertools import combinations
 
+import numpy
 import pandas as pd
+import pytest
 
+import autonormalize as an
 from autonormalize import dfd
-from autonormalize.classes import Masks
+from autonormalize.classes import PartitionCache, SearchStats
 
 path = os.getcwd()
 
@@ -49,28 +54,235 @@ def test_dfd():
     assert_equal_dependency_dics(dfd.dfd(df_2, 0.98).serialize(), dep)
 
 
+def brute_force_dependencies(df, accuracy, max_lhs_size=None):
+    partitions = PartitionCache.from_df(df)
+    n = len(df.columns)
+    unique = [i for i in range(n) if partitions.get(1 << i).num_classes() == 0]
+    attrs = [i for i in range(n) if i not in unique]
+    dependencies = {col: [[df.columns[u]] for u in unique if df.columns[u] != col] for col in df.columns}
+    for rhs in attrs:
+        others = [i for i in attrs if i != rhs]
+        found = []
+        for size in range(1, (max_lhs_size or len(others)) + 1):
+            for comb in combinations(others, size):
+                lhs = sum(1 << i for i in comb)
+                if not any(f & lhs == f for f in found) and dfd.compute_partitions(rhs, lhs, partitions, accuracy):
+                    found.append(lhs)
+        dependencies[df.columns[rhs]] += [list(partitions.to_attrs(f)) for f in found]
+    return dependencies
+
+
+def test_dfd_brute_force():
+    rng = numpy.random.RandomState(0)
+    for _ in range(10):
+        a = rng.randint(0, 4, 60)
+        b = rng.randint(0, 3, 60)
+        c = rng.randint(0, 5, 60)
+        df = pd.DataFrame({'a': a, 'b': b, 'c': c, 'd': (a * 3 + b) % 4,
+                           'e': rng.randint(0, 2, 60), 'f': (c + b) % 3, 'g': rng.randint(0, 6, 60)})
+        for accuracy in [1.00, 0.95]:
+            for max_lhs_size in [None, 2]:
+                assert_equal_dependency_dics(dfd.dfd(df, accuracy, max_lhs_size=max_lhs_size).serialize(),
+                                             brute_force_dependencies(df, accuracy, max_lhs_size))
+
+
+def test_dfd_duplicates():
+    rng = numpy.random.RandomState(0)
+    for _ in range(5):
+        a = rng.randint(0, 4, 30)
+        b = rng.randint(0, 3, 30)
+        distinct = pd.DataFrame({'id': numpy.arange(30), 'a': a, 'b': b, 'c': (a * 3 + b) % 4,
+                                 'd': rng.randint(0, 2, 30), 'e': rng.randint(0, 6, 30)})
+        df = distinct.iloc[rng.randint(0, 30, 200)].reset_index(drop=True)
+        partitions = PartitionCache.from_df(df)
+        partitions.drop_duplicates()
+        assert partitions.n_rows == df.drop_duplicates().shape[0]
+        assert partitions.total_weight() == 200
+        for accuracy in [1.00, 0.95]:
+            assert_equal_dependency_dics(dfd.dfd(df, accuracy).serialize(),
+                                         brute_force_dependencies(df, accuracy))
+        assert_equal_dependency_dics(dfd.dfd(df, 0.95, n_jobs=2).serialize(),
+                                     brute_force_dependencies(df, 0.95))
+        chunked = PartitionCache.from_chunks([df.iloc[:100], df.iloc[100:]])
+        chunked.drop_duplicates()
+        assert chunked.n_rows == partitions.n_rows and chunked.total_weight() == 200
+        assert all(isinstance(chunked.codes(i), numpy.memmap) for i in range(len(chunked.columns)))
+        assert_equal_dependency_dics(dfd.dfd(chunked, 0.95).serialize(), brute_force_dependencies(df, 0.95))
+
+
+def equivalent_columns_df(rng, n):
+    a = rng.randint(0, 4, n)
+    b = rng.randint(0, 3, n)
+    c = rng.randint(0, 5, n)
+    e = numpy.where(rng.rand(n) < 0.97, 0, rng.randint(0, 3, n))
+    return pd.DataFrame({'a': a, 'a_label': (a * 7 + 3).astype(str), 'b': b, 'c': c, 'one': 1,
+                         'd': (a * 3 + b) % 4, 'd_copy': (a * 3 + b) % 4, 'e': e, 'two': 'x',
+                         'b_neg': -b, 'a_copy': a})
+
+
+def test_split_equivalent_columns():
+    partitions = PartitionCache.from_df(equivalent_columns_df(numpy.random.RandomState(0), 60))
+    search, constants, equivalents = dfd.split_equivalent_columns(partitions, 0b11111111111)
+    assert constants == partitions.to_mask(['one', 'two'])
+    assert search == partitions.to_mask(['a', 'b', 'c', 'd', 'e'])
+    assert equivalents == {0: partitions.to_mask(['a_label', 'a_copy']), 2: partitions.to_mask(['b_neg']),
+                           5: partitions.to_mask(['d_copy'])}
+
+
+def test_dfd_equivalent_columns():
+    rng = numpy.random.RandomState(0)
+    for _ in range(5):
+        df = equivalent_columns_df(rng, 60)
+        for accuracy in [1.00, 0.95]:
+            for max_lhs_size in [None, 2]:
+                assert_equal_dependency_dics(dfd.dfd(df, accuracy, max_lhs_size=max_lhs_size).serialize(),
+                                             brute_force_dependencies(df, accuracy, max_lhs_size))
+
+
+def test_dfd_max_lhs_size():
+    dep = {"A": [], "B": [["A"]], "C": [["A"]], "D": [["A"]],
+           "E": [["C"], ["A"]], "F": [["B"], ["A"]], "G": [["A"]]}
+    assert_equal_dependency_dics(dfd.dfd(df_2, 0.98, max_lhs_size=1).serialize(), dep)
+    assert_equal_dependency_dics(dfd.dfd(df_2, 0.98, max_lhs_size=2).serialize(), dfd.dfd(df_2, 0.98).serialize())
+
+
+def test_dfd_parallel():
+    assert_equal_dependency_dics(dfd.dfd(df_2, 0.98, n_jobs=2).serialize(), dfd.dfd(df_2, 0.98).serialize())
+    assert_equal_dependency_dics(dfd.dfd(df_1, 1.00, n_jobs=2).serialize(), dfd.dfd(df_1, 1.00).serialize())
+
+
+def test_dfd_parallel_without_shared_memory(monkeypatch):
+    monkeypatch.setattr(dfd, 'shared_memory', None)
+    assert_equal_dependency_dics(dfd.dfd(df_2, 0.98, n_jobs=2).serialize(), dfd.dfd(df_2, 0.98).serialize())
+
+
+def test_dfd_checkpoint(tmpdir, monkeypatch):
+    path = str(tmpdir.join('checkpoint'))
+    monkeypatch.setattr(dfd, 'CHECKPOINT_SECONDS', 0)
+    expected = dfd.dfd(df_2, 0.98, checkpoint=path).serialize()
+
+    def find_LHSs(*args):
+        raise AssertionError('finished columns are searched again')
+    monkeypatch.setattr(dfd, 'find_LHSs', find_LHSs)
+    assert serialization_equal(dfd.dfd(df_2, 0.98, resume_from=path).serialize(), expected)
+
+    with pytest.raises(ValueError, match='different data'):
+        dfd.dfd(df_2.iloc[:-1], 0.98, resume_from=path)
+    with pytest.raises(ValueError, match='different parameters'):
+        dfd.dfd(df_2, 0.95, resume_from=path)
+
+
+def test_dfd_stats():
+    stats = {}
+    deps = dfd.dfd(df_2, 0.98, stats=stats)
+    assert serialization_equal(deps.serialize(), dfd.dfd(df_2, 0.98).serialize())
+    assert set(stats.keys()) == set(['B', 'C', 'D', 'E', 'F', 'G'])
+    for col_stats in stats.values():
+        assert col_stats.nodes_visited <= col_stats.nodes_created
+        assert col_stats.partition_checks == col_stats.nodes_visited - col_stats.nodes_inferred
+        assert col_stats.sample_refutations <= col_stats.partition_checks
+        assert col_stats.seed_rounds >= 1
+        assert col_stats.approximate_seconds <= col_stats.seconds
+    assert stats['E'].to_dict()['cache_hit_rate'] == stats['E'].cache_hits / (stats['E'].cache_hits + stats['E'].cache_misses)
+
+
+def test_dfd_time_budget():
+    expected = dfd.dfd(df_2, 0.98).serialize()
+    complete = {}
+    deps = dfd.dfd(df_2, 0.98, time_budget=1000, complete=complete)
+    assert serialization_equal(deps.serialize(), expected)
+    assert complete == dict.fromkeys(df_2.columns, True)
+
+    complete = {}
+    deps = dfd.dfd(df_2, 0.98, time_budget=0, complete=complete).serialize()
+    assert complete == {'A': True, 'B': False, 'C': False, 'D': False, 'E': False, 'F': False, 'G': False}
+    for rhs, lhss in deps.items():
+        assert set(map(frozenset, lhss)) <= set(map(frozenset, expected[rhs]))
+
+    stats = SearchStats()
+    assert dfd.find_LHSs(4, 0b1111110, PartitionCache.from_df(df_2), 0.98, stats=stats,
+                         deadline=time.time()).all_sets() == set()
+    assert not stats.complete
+
+
+def test_find_dependencies_time_budget():
+    deps, complete = an.find_dependencies(df_2, time_budget=1000)
+    assert serialization_equal(deps.serialize(), an.find_dependencies(df_2).serialize())
+    assert all(complete.values())
+
+
+def test_dfd_max_bytes():
+    partitions = PartitionCache.from_df(df_2)
+    partitions.set_max_bytes(200000)
+    assert serialization_equal(dfd.dfd(partitions, 0.98).serialize(), dfd.dfd(df_2, 0.98).serialize())
+    assert partitions._partitions.nbytes <= 200000
+    assert partitions._partitions.evictions > 0
+    full = PartitionCache.from_df(df_2)
+    for attrs in range(1, 1 << len(df_2.columns), 7):
+        assert partitions.get(attrs).error() == full.get(attrs).error()
+
+    deps = an.find_dependencies(df_2, n_jobs=2, max_cache_bytes=200000)
+    assert serialization_equal(deps.serialize(), an.find_dependencies(df_2).serialize())
+
+
 def test_compute_partitions():
-    mask = Masks(['a', 'b', 'c'])
     a = [6, 2, 3, 7, 8, 1, 0, 2, 0, 3, 6, 0, 4, 6, 8, 7, 6, 8, 1, 5, 1, 3, 3, 0, 0, 4, 5, 5, 7, 0, 8, 2, 4, 7, 0, 0, 6, 4, 6, 8]
     # b = [int(x%2 == 0) for x in a]
     b = [1, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1]
     # c = [(a[i] + b[i])<4 for i in range(40)]
     c = [False, True, True, False, False, True, True, True, True, True, False, True, False, False, False, False, False, False, True, False, True, True, True, True, True, False, False, False, False, True, False, True, False, False, True, True, False, False, False, False]
     df = pd.DataFrame({'a': a, 'b': b, 'c': c})
-    assert dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 1.00, mask)
-    assert dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 0.90, mask)
+    assert dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 1.00)
+    assert dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 0.90)
 
-    assert not dfd.compute_partitions(df, 'a', frozenset(['c']), {}, 1.00, mask)
-    assert not dfd.compute_partitions(df, 'a', frozenset(['c']), {}, 0.90, mask)
+    assert not dfd.compute_partitions(0, 0b100, PartitionCache.from_df(df), 1.00)
+    assert not dfd.compute_partitions(0, 0b100, PartitionCache.from_df(df), 0.90)
 
     c[0] = True
     df = pd.DataFrame({'a': a, 'b': b, 'c': c})
-    assert dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 0.97, mask)
-    assert not dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 0.98, mask)
+    assert dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 0.97)
+    assert not dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 0.98)
     c[35] = False
     df = pd.DataFrame({'a': a, 'b': b, 'c': c})
-    assert dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 0.95, mask)
-    assert not dfd.compute_partitions(df, 'c', frozenset(['a', 'b']), {}, 0.96, mask)
+    assert dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 0.95)
+    assert not dfd.compute_partitions(2, 0b011, PartitionCache.from_df(df), 0.96)
+
+
+def test_sample_refutation():
+    rng = numpy.random.RandomState(1)
+    a = rng.randint(0, 40, 5000)
+    b = rng.randint(0, 3, 5000)
+    c = numpy.where(rng.rand(5000) < 0.01, 0, a % 7 + b)
+    df = pd.DataFrame({'a': a, 'b': b, 'c': c})
+    for accuracy in [1.00, 0.99, 0.98, 0.90]:
+        sampled = PartitionCache.from_df(df)
+        dfd.add_sample(sampled, accuracy)
+        assert sampled.sample is not None
+        for rhs in range(3):
+            for lhs in range(1, 8):
+                if not lhs & (1 << rhs):
+                    expected = dfd.compute_partitions(rhs, lhs, PartitionCache.from_df(df), accuracy)
+                    assert dfd.compute_partitions(rhs, lhs, sampled, accuracy) == expected
+
+
+def test_partition():
+    df = pd.DataFrame({'a': [1, 1, 2, 2, 3, None, None],
+                       'b': ['x', 'y', 'x', 'x', 'y', 'y', 'y'],
+                       'c': [0, 1, 2, 3, 4, 5, 6]})
+    partitions = PartitionCache.from_df(df)
+    for attrs in [['a'], ['b'], ['c'], ['a', 'b'], ['a', 'c'], ['b', 'c'], ['a', 'b', 'c']]:
+        assert dfd.partition(partitions.to_mask(attrs), partitions) == df.drop_duplicates(attrs).shape[0]
+
+    chunked = PartitionCache.from_chunks([df.iloc[:3], df.iloc[3:4], df.iloc[4:]])
+    assert chunked.n_rows == 7
+    for attrs in [['a'], ['b'], ['c'], ['a', 'b'], ['a', 'c'], ['b', 'c'], ['a', 'b', 'c']]:
+        assert dfd.partition(chunked.to_mask(attrs), chunked) == df.drop_duplicates(attrs).shape[0]
+
+
+def test_dfd_chunks():
+    chunks = (df_2.iloc[i:i + 30000] for i in range(0, df_2.shape[0], 30000))
+    assert serialization_equal(dfd.dfd(PartitionCache.from_chunks(chunks), 0.98).serialize(),
+                               dfd.dfd(df_2, 0.98).serialize())
 
 
 # def test_approximate_dependencies():
@@ -4,6 +4,8 @@ from unittest.mock import patch
 
 import pytest
 import autonormalize as an
+from autonormalize.examples import benchmark
+from autonormalize.examples.example_data_gen import generate_planted
 
 
 def test_ft_mock_customer():
@@ -51,3 +53,39 @@ def test_normalize_entityset(auto_entityset):
     error = "There is more than one dataframe in this EntitySet"
     with pytest.raises(ValueError, match=error):
         an.normalize_entityset(es, accuracy)
+
+
+def test_find_dependencies_csv(tmpdir, monkeypatch):
+    df = ft.demo.load_mock_customer(n_customers=80, n_products=50, n_sessions=200,
+                                    n_transactions=1000, return_single_table=True)
+    path = str(tmpdir.join('data.csv'))
+    df.to_csv(path, index=False)
+    monkeypatch.setattr(an.autonormalize, 'CHUNK_ROWS', 300)
+
+    deps = an.find_dependencies(path)
+    expected = an.find_dependencies(df)
+    assert deps.serialize() == expected.serialize()
+    assert deps.get_prim_key() == expected.get_prim_key()
+
+
+def test_generate_planted():
+    df = generate_planted(rows=2000, cols=9, cardinality=20, noise=0.01)
+    assert df.shape == (2000, 9)
+    deps = an.find_dependencies(df).serialize()
+    assert ['order_id'] in deps['order_date']
+    assert ['order_id'] in deps['customer_id']
+    assert ['customer_id'] in deps['customer_city']
+    assert ['customer_city'] in deps['region']
+    assert ['customer_id'] in deps['segment']
+    assert ['customer_id'] not in an.find_dependencies(df, accuracy=1.00).serialize()['segment']
+
+
+def test_benchmark():
+    result = benchmark.run_case(rows=500, cols=8, cardinality=10, noise=0.0)
+    for step in ['find_dependencies', 'normalize_dataframe', 'make_entityset']:
+        assert result[step + '_seconds'] > 0
+        assert result[step + '_peak_bytes'] > 0
+    results = {'cases': [result]}
+    assert (benchmark.compare(results, results) == 1).all().all()
+    with pytest.raises(ValueError):
+        benchmark.measure(lambda: None, 0)
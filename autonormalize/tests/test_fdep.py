@@ -0,0 +1,75 @@
+import os
+
+import numpy
+import pandas as pd
+import pytest
+
+import autonormalize as an
+from autonormalize import dfd, fdep
+from autonormalize.classes import PartitionCache
+from autonormalize.tests.test_dfd import (
+    brute_force_dependencies,
+    equivalent_columns_df,
+    serialization_equal
+)
+from autonormalize.tests.test_tane import sorted_deps
+
+path = os.getcwd()
+
+df_2 = pd.read_csv(os.path.join(path, 'autonormalize/examples/example_3'))
+
+
+def test_fdep():
+    for accuracy in [1.00, 0.98]:
+        assert serialization_equal(fdep.fdep(df_2, accuracy).serialize(), dfd.dfd(df_2, accuracy).serialize())
+
+
+def test_fdep_brute_force():
+    rng = numpy.random.RandomState(0)
+    for _ in range(10):
+        a = rng.randint(0, 4, 60)
+        b = rng.randint(0, 3, 60)
+        df = pd.DataFrame({'a': a, 'b': b, 'c': (a * 3 + b) % 4, 'd': rng.randint(0, 2, 60),
+                           'e': rng.randint(0, 6, 60), 'f': (a + b) % 3})
+        for accuracy in [1.00, 0.95]:
+            for max_lhs_size in [None, 2]:
+                assert sorted_deps(fdep.fdep(df, accuracy, max_lhs_size=max_lhs_size).serialize()) == \
+                    sorted_deps(brute_force_dependencies(df, accuracy, max_lhs_size))
+
+
+def test_fdep_equivalent_columns():
+    rng = numpy.random.RandomState(0)
+    for _ in range(5):
+        df = equivalent_columns_df(rng, 60)
+        for accuracy in [1.00, 0.95]:
+            assert sorted_deps(fdep.fdep(df, accuracy).serialize()) == sorted_deps(brute_force_dependencies(df, accuracy))
+
+
+def test_maximal_sets():
+    assert sorted(fdep.maximal_sets([0b0011, 0b0111, 0b1000, 0b0001, 0, 0b1000])) == [0b0111, 0b1000]
+
+
+def test_agree_sets():
+    partitions = PartitionCache.from_df(pd.DataFrame({'a': [1, 1, 2], 'b': [3, 4, 4], 'c': [5, 5, 5]}))
+    left = numpy.array([0, 1, 0])
+    right = numpy.array([1, 2, 2])
+    assert fdep.agree_sets(partitions, 0b111, left, right) == {0b101, 0b110, 0b100}
+    assert fdep.agree_sets(partitions, 0b011, left, right) == {0b001, 0b010, 0}
+
+
+def test_agree_sets_wide():
+    rng = numpy.random.RandomState(0)
+    df = pd.DataFrame(rng.randint(0, 2, (40, 11)), columns=list('abcdefghijk'))
+    partitions = PartitionCache.from_df(df)
+    left, right = rng.randint(0, 40, 100), rng.randint(0, 40, 100)
+    attrs = 0b11011111101
+    expected = set(sum(1 << i for i in range(11) if attrs >> i & 1 and df.iloc[x, i] == df.iloc[y, i])
+                   for x, y in zip(left, right))
+    assert fdep.agree_sets(partitions, attrs, left, right) == expected
+
+
+def test_find_dependencies_fdep():
+    deps = an.find_dependencies(df_2, algorithm='fdep')
+    assert sorted_deps(deps.serialize()) == sorted_deps(an.find_dependencies(df_2).serialize())
+    with pytest.raises(ValueError, match='require algorithm="dfd"'):
+        an.find_dependencies(df_2, algorithm='fdep', collect_stats=True)
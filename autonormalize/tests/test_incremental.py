@@ -0,0 +1,76 @@
+import os
+
+import numpy
+import pandas as pd
+
+import autonormalize as an
+from autonormalize import dfd
+from autonormalize.incremental import DependencyState, GroupCounts
+
+path = os.getcwd()
+
+df_2 = pd.read_csv(os.path.join(path, 'autonormalize/examples/example_3'))
+
+
+def deps_equal(dic_1, dic_2):
+    sets_1 = {rhs: set(map(frozenset, lhss)) for rhs, lhss in dic_1.items()}
+    sets_2 = {rhs: set(map(frozenset, lhss)) for rhs, lhss in dic_2.items()}
+    return sets_1 == sets_2
+
+
+def test_group_counts():
+    counts = GroupCounts()
+    assert counts.add([numpy.array([0, 0, 1])], numpy.array([2, 2, 3])) == 0
+    assert counts.add([numpy.array([0, 1])], numpy.array([3, 3])) == 1
+    assert counts.add([numpy.array([0, 0])], numpy.array([3, 3])) == 2
+
+
+def test_group_counts_brute_force():
+    rng = numpy.random.RandomState(0)
+    for _ in range(10):
+        a, b, c = (rng.randint(0, n, 300) for n in (4, 3, 5))
+        # larger codes later on, and groups that first occur once
+        a[150:] = rng.randint(0, 400, 150)
+        c[200:] = rng.randint(0, 300, 100)
+        counts = GroupCounts()
+        for end in range(50, 350, 50):
+            g3 = counts.add([a[end - 50:end], b[end - 50:end]], c[end - 50:end])
+            df = pd.DataFrame({'a': a[:end], 'b': b[:end], 'c': c[:end]})
+            most = df.groupby(['a', 'b', 'c']).size().groupby(level=[0, 1]).max()
+            assert g3 == end - most.sum()
+
+
+def test_append():
+    rng = numpy.random.RandomState(0)
+    for _ in range(10):
+        a = rng.randint(0, 4, 80)
+        b = rng.randint(0, 3, 80)
+        df = pd.DataFrame({'id': numpy.arange(80), 'a': a, 'b': b, 'c': (a * 3 + b) % 5,
+                           'd': rng.randint(0, 2, 80)})
+        for accuracy in [1.00, 0.9]:
+            state = DependencyState.from_df(df.iloc[:40], accuracy)
+            for end in range(50, 90, 10):
+                state.append(df.iloc[end - 10:end])
+                assert deps_equal(state.dfd_dependencies().serialize(),
+                                  dfd.dfd(df.iloc[:end], accuracy).serialize())
+
+
+def test_append_breaks_unique():
+    df = pd.DataFrame({'a': [1, 2, 3, 4], 'b': [1, 1, 2, 2], 'c': [5, 5, 6, 6]})
+    state = DependencyState.from_df(df, 1.00)
+    assert sorted(state.dfd_dependencies().serialize()['b']) == [['a'], ['c']]
+    new = pd.DataFrame({'a': [4], 'b': [3], 'c': [6]})
+    state.append(new)
+    assert deps_equal(state.dfd_dependencies().serialize(),
+                      dfd.dfd(pd.concat([df, new]), 1.00).serialize())
+
+
+def test_update_dependencies(tmpdir):
+    deps, state = an.find_dependencies(df_2.iloc[:99000], return_state=True)
+    assert deps_equal(deps.serialize(), an.find_dependencies(df_2.iloc[:99000]).serialize())
+    state.save(str(tmpdir.join('state')))
+    state = DependencyState.load(str(tmpdir.join('state')))
+    new_deps = an.update_dependencies(deps, state, df_2.iloc[99000:])
+    expected = an.find_dependencies(df_2)
+    assert deps_equal(new_deps.serialize(), expected.serialize())
+    assert new_deps.get_prim_key() == expected.get_prim_key()
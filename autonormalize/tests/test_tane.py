@@ -0,0 +1,61 @@
+import os
+
+import numpy
+import pandas as pd
+import pytest
+
+import autonormalize as an
+from autonormalize import dfd, tane
+from autonormalize.tests.test_dfd import (
+    brute_force_dependencies,
+    equivalent_columns_df,
+    serialization_equal
+)
+
+path = os.getcwd()
+
+df_2 = pd.read_csv(os.path.join(path, 'autonormalize/examples/example_3'))
+
+
+def sorted_deps(dic):
+    return {rhs: sorted(sorted(lhs) for lhs in lhss) for rhs, lhss in dic.items()}
+
+
+def test_tane():
+    for accuracy in [1.00, 0.98]:
+        assert serialization_equal(tane.tane(df_2, accuracy).serialize(), dfd.dfd(df_2, accuracy).serialize())
+
+
+def test_tane_brute_force():
+    rng = numpy.random.RandomState(0)
+    for _ in range(10):
+        a = rng.randint(0, 4, 60)
+        b = rng.randint(0, 3, 60)
+        df = pd.DataFrame({'a': a, 'b': b, 'c': (a * 3 + b) % 4, 'd': rng.randint(0, 2, 60),
+                           'e': rng.randint(0, 6, 60), 'f': (a + b) % 3})
+        for accuracy in [1.00, 0.95]:
+            for max_lhs_size in [None, 2]:
+                assert sorted_deps(tane.tane(df, accuracy, max_lhs_size=max_lhs_size).serialize()) == \
+                    sorted_deps(brute_force_dependencies(df, accuracy, max_lhs_size))
+
+
+def test_tane_equivalent_columns():
+    rng = numpy.random.RandomState(0)
+    for _ in range(5):
+        df = equivalent_columns_df(rng, 60)
+        for accuracy in [1.00, 0.95]:
+            assert sorted_deps(tane.tane(df, accuracy).serialize()) == sorted_deps(brute_force_dependencies(df, accuracy))
+
+
+def test_next_level():
+    level = {0b0011: 0b1111, 0b0101: 0b0111, 0b0110: 0b1110, 0b1001: 0b1111}
+    assert tane.next_level(level) == {0b0111: 0b0110}
+
+
+def test_find_dependencies_algorithm():
+    deps = an.find_dependencies(df_2, algorithm='tane')
+    assert sorted_deps(deps.serialize()) == sorted_deps(an.find_dependencies(df_2).serialize())
+    with pytest.raises(ValueError, match='Unknown algorithm'):
+        an.find_dependencies(df_2, algorithm='fun')
+    with pytest.raises(ValueError, match='require algorithm="dfd"'):
+        an.find_dependencies(df_2, algorithm='tane', n_jobs=2)